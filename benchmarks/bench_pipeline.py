@@ -0,0 +1,325 @@
+"""Benchmarks for the RCE update pipeline and mask algorithms.
+
+Runs without Home Assistant and without network access: the HA-free
+modules (mask_engine, analysis, series, scheduler, forecast, battery,
+window_index) are loaded straight from custom_components/rce and fed
+with synthetic RCE price series.
+
+    python benchmarks/bench_pipeline.py                             # compare with baseline.json
+    python benchmarks/bench_pipeline.py --save-baseline --rounds 5  # record a new baseline
+    python benchmarks/bench_pipeline.py -k horizon                  # only matching cases
+
+Time is the median per-call time over several repeats, and the median
+of that over --rounds full passes (interleaved, so a slow stretch of the
+machine only hits one pass); memory is the tracemalloc peak of a single
+call. A case only fails the baseline comparison when it is both
+--max-ratio times and --min-delta-us microseconds slower, so timer noise
+on micro-cases does not trip it.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import math
+import random
+import statistics
+import sys
+import timeit
+import tracemalloc
+import types
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+PKG_DIR = ROOT.parent / "custom_components" / "rce"
+BASELINE = ROOT / "baseline.json"
+
+# the package __init__ needs Home Assistant, the pure modules do not
+_pkg = types.ModuleType("rce")
+_pkg.__path__ = [str(PKG_DIR)]
+sys.modules.setdefault("rce", _pkg)
+
+const = importlib.import_module("rce.const")
+mask_engine = importlib.import_module("rce.mask_engine")
+analysis = importlib.import_module("rce.analysis")
+series = importlib.import_module("rce.series")
+scheduler = importlib.import_module("rce.scheduler")
+forecast = importlib.import_module("rce.forecast")
+battery = importlib.import_module("rce.battery")
+window_index = importlib.import_module("rce.window_index")
+
+
+# ============================================================
+# SYNTHETIC DATA
+# ============================================================
+def synthetic_day(rng: random.Random, slots: int = 96) -> list[float]:
+    """One day of RCE-like prices: night valley, solar dip, evening peak."""
+    prices = []
+    for i in range(slots):
+        h = i / 4
+        base = 420 + 180 * math.exp(-((h - 19.5) ** 2) / 6)
+        solar = 380 * math.exp(-((h - 13) ** 2) / 8)
+        night = 90 * math.exp(-((h - 3) ** 2) / 5)
+        prices.append(round(base - solar - night + rng.gauss(0, 25), 2))
+    return prices
+
+
+def synthetic_days(days: int, seed: int = 2511) -> list[list[float]]:
+    rng = random.Random(seed)
+    return [synthetic_day(rng) for _ in range(days)]
+
+
+def default_options(**overrides) -> dict:
+    options = {
+        const.CONF_TIME_RESOLUTION: const.RESOLUTION_15M,
+        const.CONF_PRICE_MODE: const.DEFAULT_PRICE_MODE,
+        const.CONF_OPERATION_MODE: const.DEFAULT_OPERATION_MODE,
+        const.CONF_NEGATIVE_PRICES: True,
+        const.CONF_CUSTOM_PEAK_HOURS_RANGE: "00-24",
+        const.CONF_CONSECUTIVE_COUNT: 4,
+        const.CONF_NOT_CONSECUTIVE_COUNT: 4,
+        "super_eco_percentile": 10,
+        "super_eco_min_window": 3,
+        "eco_percentile": 20,
+        "eco_min_window": 4,
+        "comfort_percentile": 30,
+        "comfort_min_window": 2,
+        "aggressive_percentile": 45,
+        "aggressive_min_window": 1,
+    }
+    options.update(overrides)
+    return options
+
+
+# ============================================================
+# MEASUREMENT
+# ============================================================
+def measure(fn, repeat: int = 7, min_time: float = 0.2) -> dict:
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time / repeat and number < 1_000_000:
+        number *= 2
+    # mediana jest odporna na pojedyncze przebiegi zakłócone przez system
+    typical = statistics.median(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"us": round(typical * 1e6, 2), "peak_kib": round(peak / 1024, 1)}
+
+
+# ============================================================
+# CASES
+# ============================================================
+def build_cases() -> dict:
+    days = synthetic_days(182)
+    today, tomorrow = days[0], days[1]
+    hourly = analysis.aggregate_hourly(today)
+    horizon = today + tomorrow
+    history = [p for day in days for p in day]
+
+    inputs = {
+        "day_15min": today,
+        "day_1h": hourly,
+        "horizon_48h": horizon,
+        "history_6m": history,
+    }
+
+    now = datetime(2025, 6, 14, 9, 7, tzinfo=timezone(timedelta(hours=2)))
+    day_start = datetime(2025, 6, 13, 22, 0, tzinfo=timezone.utc)
+    rows_today = [{"rce_pln": str(p)} for p in today]
+    rows_tomorrow = [{"rce_pln": str(p)} for p in tomorrow]
+
+    cases = {}
+
+    # ---- mask engine per price mode / operation mode ----
+    for name, prices in inputs.items():
+        for price_mode in const.PRICE_MODES:
+            modes = const.OPERATION_MODES if price_mode == const.PRICE_MODE_LOW_PRICE_CUTOFF else [None]
+            for operation_mode in modes:
+                opt = default_options(
+                    **{const.CONF_OPERATION_MODE: operation_mode or const.DEFAULT_OPERATION_MODE}
+                )
+                slot_hours = [(i // 4) % 24 for i in range(len(prices))]
+                label = f"mask/{name}/{price_mode}" + (f"/{operation_mode}" if operation_mode else "")
+                cases[label] = (
+                    lambda p=prices, m=price_mode, o=opt, h=slot_hours:
+                    analysis.options_mask(p, m, o, h)
+                )
+
+    # ---- building blocks ----
+    for name, prices in inputs.items():
+        mask = analysis.options_mask(prices, const.PRICE_MODE_LOW_PRICE_CUTOFF, default_options())
+        cases[f"min_window/{name}"] = lambda m=mask: mask_engine.apply_min_window(m, 8)
+        cases[f"windows/{name}"] = lambda p=prices, m=mask: analysis.build_windows_data(p, m)
+
+    # ---- on-demand window search (rce.find_cheapest_window) ----
+    cases["find_window/horizon_48h/10_slots"] = lambda: analysis.find_window(horizon, day_start, 10, 0, len(horizon))
+    cases["find_window/horizon_48h/10_slots_profile"] = lambda: analysis.find_window(
+        horizon, day_start, 10, 0, len(horizon), [0.5, 0.5, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 0.3, 0.3]
+    )
+
+    # ---- provisional tomorrow from 28 archived days ----
+    archive = {
+        (date(2025, 6, 14) - timedelta(days=i + 1)).isoformat(): day for i, day in enumerate(days[1:29])
+    }
+    cases["forecast/28_days"] = lambda: forecast.forecast_day(archive, date(2025, 6, 14))
+    provisional = forecast.forecast_day(archive, date(2025, 6, 14)).prices
+    cases["build_data/15min/daily/provisional_tomorrow"] = lambda: analysis.build_data(
+        today, None, default_options(), now, day_start, str.lower, provisional
+    )
+
+    # ---- energy plans (overnight EV charge, 22:00 -> 07:00 = 36 slots) ----
+    overnight = horizon[88:124]
+    cases["plan_slots/overnight/12_slots"] = lambda: scheduler.plan_slots(overnight, 12)
+    cases["plan_slots/overnight/12_slots_min_run_2_starts_2"] = lambda: scheduler.plan_slots(
+        overnight, 12, min_run=2, max_starts=2
+    )
+    ev_plan = {
+        const.CONF_PROFILE_NAME: "EV",
+        const.CONF_PLAN_ENERGY: 20.0,
+        const.CONF_PLAN_POWER: 7.4,
+        const.CONF_PLAN_EARLIEST: "18:00",
+        const.CONF_PLAN_DEADLINE: "07:00",
+        const.CONF_PLAN_MIN_RUN: 30,
+        const.CONF_PLAN_MAX_STARTS: 2,
+    }
+    cases["energy_plan/horizon_48h/ev"] = lambda: analysis.energy_plan(
+        series.price_array(horizon), len(today), ev_plan
+    )
+    site_loads = [
+        ev_plan,
+        {**ev_plan, const.CONF_PROFILE_NAME: "Boiler", const.CONF_PLAN_ENERGY: 6.0,
+         const.CONF_PLAN_POWER: 3.0, const.CONF_PLAN_EARLIEST: "00:00", const.CONF_PLAN_DEADLINE: "00:00",
+         const.CONF_PLAN_PRIORITY: 2},
+        {**ev_plan, const.CONF_PROFILE_NAME: "Heat pump", const.CONF_PLAN_ENERGY: 12.0,
+         const.CONF_PLAN_POWER: 4.0, const.CONF_PLAN_EARLIEST: "06:00", const.CONF_PLAN_DEADLINE: "22:00",
+         const.CONF_PLAN_MIN_RUN: 60, const.CONF_PLAN_MAX_STARTS: 3, const.CONF_PLAN_PRIORITY: 2},
+        {**ev_plan, const.CONF_PROFILE_NAME: "Dishwasher", const.CONF_PLAN_ENERGY: 1.5,
+         const.CONF_PLAN_POWER: 2.0, const.CONF_PLAN_EARLIEST: "20:00", const.CONF_PLAN_DEADLINE: "06:00",
+         const.CONF_PLAN_MIN_RUN: 45, const.CONF_PLAN_MAX_STARTS: 1, const.CONF_PLAN_PRIORITY: 3},
+    ]
+    cases["energy_plans/horizon_48h/4_loads_cap_11kw"] = lambda: analysis.energy_plans(
+        series.price_array(horizon), len(today), site_loads, 11.0
+    )
+
+    # ---- calendar: 182 archived days of windows, month-view query ----
+    month_windows = []
+    for i, day in enumerate(days):
+        month_windows += window_index.timed_windows(
+            analysis.day_windows(day, default_options()), day_start - timedelta(days=i)
+        )
+    index = window_index.WindowIndex(month_windows)
+    month_start = day_start - timedelta(days=35)
+    cases["calendar/index_182_days"] = lambda: window_index.WindowIndex(month_windows)
+    cases["calendar/query_6_weeks"] = lambda: index.between(month_start, day_start + timedelta(days=7))
+    cases["calendar/archive_day_windows"] = lambda: analysis.day_windows(today, default_options())
+
+    # ---- battery arbitrage (10 kWh, 5 kW, 90 %) ----
+    for name in ("day_15min", "horizon_48h"):
+        cases[f"battery/{name}/100_levels"] = lambda p=inputs[name]: battery.optimize_battery(p, 10.0, 5.0, 5.0)
+
+    # ---- full refresh compute (what _async_update_data does after fetching) ----
+    for res in (const.RESOLUTION_15M, const.RESOLUTION_1H):
+        for horizon_on in (False, True):
+            for price_mode in const.PRICE_MODES:
+                opt = default_options(**{
+                    const.CONF_TIME_RESOLUTION: res,
+                    const.CONF_PRICE_MODE: price_mode,
+                    const.CONF_ROLLING_HORIZON: horizon_on,
+                })
+                label = f"build_data/{res}/{'horizon' if horizon_on else 'daily'}/{price_mode}"
+                cases[label] = lambda o=opt: analysis.build_data(
+                    series.price_array(float(x["rce_pln"]) for x in rows_today),
+                    series.price_array(float(x["rce_pln"]) for x in rows_tomorrow),
+                    o, now, day_start, str.lower,
+                )
+
+    profiles = [
+        {const.CONF_PROFILE_NAME: f"p{i}", const.CONF_PRICE_MODE: mode}
+        for i, mode in enumerate(const.PRICE_MODES * 2)
+    ]
+    opt = default_options(**{const.CONF_PROFILES: profiles})
+    cases["build_data/15min/daily/8_profiles"] = lambda: analysis.build_data(
+        list(today), list(tomorrow), opt, now, day_start, str.lower
+    )
+
+    # ---- state attribute payload (market price + top3 sensors) ----
+    data = analysis.build_data(list(today), list(tomorrow), default_options(), now, day_start, str.lower)
+
+    # the same builders the sensors use, serialized as the state machine would
+    cases["attributes/market_price"] = lambda: json.dumps(
+        analysis.market_price_attributes(data, compact=False)
+    )
+    cases["attributes/market_price_compact"] = lambda: json.dumps(
+        analysis.market_price_attributes(data, compact=True)
+    )
+    cases["attributes/top3_windows"] = lambda: json.dumps(
+        analysis.top_windows_attributes(data["top_windows_today"], 4)
+    )
+
+    return cases
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="filter", help="only run cases containing this text")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE.name}")
+    parser.add_argument("--max-ratio", type=float, default=1.5,
+                        help="exit non-zero when a case is this much slower than baseline")
+    parser.add_argument("--min-delta-us", type=float, default=50.0,
+                        help="ignore slowdowns smaller than this many microseconds")
+    parser.add_argument("--rounds", type=int, default=3, help="full passes to take the median of")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    cases = {
+        label: fn for label, fn in build_cases().items()
+        if not args.filter or args.filter in label
+    }
+    rounds: dict[str, list[dict]] = {label: [] for label in cases}
+    for _ in range(max(args.rounds, 1)):
+        for label, fn in cases.items():
+            rounds[label].append(measure(fn))
+
+    results = {}
+    regressions = []
+
+    print(f"{'case':<78} {'time us':>10} {'peak KiB':>9} {'vs base':>8}")
+    for label, measured in rounds.items():
+        result = {
+            "us": round(statistics.median(m["us"] for m in measured), 2),
+            "peak_kib": measured[0]["peak_kib"],
+        }
+        results[label] = result
+
+        ratio = ""
+        if label in baseline and baseline[label]["us"]:
+            r = result["us"] / baseline[label]["us"]
+            ratio = f"{r:.2f}x"
+            if r > args.max_ratio and result["us"] - baseline[label]["us"] > args.min_delta_us:
+                regressions.append(label)
+        print(f"{label:<78} {result['us']:>10.2f} {result['peak_kib']:>9.1f} {ratio:>8}")
+
+    if args.save_baseline:
+        # pełny przebieg zastępuje bazę, więc usunięte przypadki z niej znikają
+        saved = {**baseline, **results} if args.filter else results
+        BASELINE.write_text(json.dumps(saved, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {BASELINE}")
+    elif regressions:
+        print(f"{len(regressions)} case(s) slower than {args.max_ratio}x baseline:")
+        for label in regressions:
+            print(f"  {label}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
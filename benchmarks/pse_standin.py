@@ -0,0 +1,255 @@
+"""Local stand-in for the PSE RCE API (api.raporty.pse.pl/api/rce-pln).
+
+Serves synthetic prices (or a directory of recorded payloads) with the
+same OData query subset the integration uses, so the polling, retry and
+paging logic can be load-tested and incidents reproduced offline. Point
+the integration at it via Options -> Data source -> API URL.
+
+    python benchmarks/pse_standin.py                          # http://127.0.0.1:8765/api/rce-pln
+    python benchmarks/pse_standin.py --latency 800 --jitter 400 --error-rate 0.2
+    python benchmarks/pse_standin.py --publish-at 15:30 --partial 40
+    python benchmarks/pse_standin.py --dst 2025-06-14:92 --page-size 50
+    python benchmarks/pse_standin.py --replay path/to/recordings
+
+Supported query options: $filter on business_date (eq/ge/gt/le/lt joined
+with "and"), $select, $top and $skip; larger results are paged through
+@odata.nextLink. Responses carry an ETag and honour If-None-Match.
+Standard library only.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import types
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from bench_pipeline import synthetic_day
+
+try:
+    from zoneinfo import ZoneInfo
+
+    WARSAW = ZoneInfo("Europe/Warsaw")
+except Exception:  # brak bazy stref czasowych
+    WARSAW = None
+
+# recorded payloads are read with the integration's own (HA-free) module
+PKG_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "rce"
+_pkg = types.ModuleType("rce")
+_pkg.__path__ = [str(PKG_DIR)]
+sys.modules.setdefault("rce", _pkg)
+replay = importlib.import_module("rce.replay")
+
+API_PATH = "/api/rce-pln"
+CONDITION = re.compile(r"business_date\s+(eq|ge|gt|le|lt)\s+'(\d{4}-\d{2}-\d{2})'")
+COMPARE = {
+    "eq": lambda a, b: a == b,
+    "ge": lambda a, b: a >= b,
+    "gt": lambda a, b: a > b,
+    "le": lambda a, b: a <= b,
+    "lt": lambda a, b: a < b,
+}
+
+
+# ============================================================
+# DATA
+# ============================================================
+def local_now() -> datetime:
+    return datetime.now(WARSAW) if WARSAW else datetime.now().astimezone()
+
+
+def day_slots(day: date) -> int:
+    """Quarter-hours in the business day: 92 / 100 on DST change days."""
+    if WARSAW is None:
+        return 96
+    # różnica w UTC; w tej samej strefie Python liczy czas ścienny
+    start = datetime.combine(day, dt_time(), WARSAW).astimezone(timezone.utc)
+    end = datetime.combine(day + timedelta(days=1), dt_time(), WARSAW).astimezone(timezone.utc)
+    return int((end - start).total_seconds() // 900)
+
+
+def day_rows(day: date, prices: list[float]) -> list[dict]:
+    """PSE-shaped rows; dtime is the local end of each quarter-hour."""
+    tz = WARSAW or timezone.utc
+    start = datetime.combine(day, dt_time(), tz).astimezone(timezone.utc)
+    rows = []
+    for i, price in enumerate(prices):
+        begin = (start + timedelta(minutes=15 * i)).astimezone(tz)
+        end = (start + timedelta(minutes=15 * (i + 1))).astimezone(tz)
+        rows.append({
+            "business_date": day.isoformat(),
+            "dtime": end.strftime("%Y-%m-%d %H:%M:%S"),
+            "period": f"{begin:%H:%M} - {end:%H:%M}",
+            "rce_pln": price,
+        })
+    return rows
+
+
+class Source:
+    """Rows per business day, synthetic or replayed, with publication rules."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.dst = dict(item.split(":") for item in args.dst)
+        self.recorded = replay.load_recorded_days(args.replay) if args.replay else None
+
+    def rows(self, day: date) -> list[dict]:
+        now = local_now()
+        today = now.date()
+
+        if self.recorded is not None:
+            found = replay.replay_range(self.recorded, today.isoformat(), day.isoformat(), day.isoformat())
+            rows = [{"business_date": day.isoformat(), **row} for row in found.get(day.isoformat(), [])]
+        else:
+            slots = int(self.dst.get(day.isoformat(), day_slots(day)))
+            rows = day_rows(day, synthetic_day(random.Random(day.toordinal()), slots))
+
+        if day > today:
+            publish = datetime.combine(today, self.args.publish_at, now.tzinfo)
+            if day > today + timedelta(days=1) or now < publish:
+                # przed publikacją: brak danych albo dzień częściowy
+                return rows[:self.args.partial] if day == today + timedelta(days=1) else []
+        return rows
+
+
+# ============================================================
+# HTTP
+# ============================================================
+def parse_filter(expression: str):
+    conditions = [(COMPARE[op], date.fromisoformat(value)) for op, value in CONDITION.findall(expression)]
+    if not conditions:
+        raise ValueError(f"unsupported $filter: {expression!r}")
+    return lambda day: all(test(day, value) for test, value in conditions)
+
+
+def make_handler(source: Source, stats: dict, lock: threading.Lock):
+    args = source.args
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "PSEStandIn/1.0"
+
+        def do_GET(self) -> None:
+            started = time.perf_counter()
+            status, rows = self._handle()
+            with lock:
+                stats["requests"] += 1
+                stats[status] = stats.get(status, 0) + 1
+            print(
+                f"{datetime.now():%H:%M:%S} {status} {rows:>4} rows "
+                f"{(time.perf_counter() - started) * 1000:7.1f} ms  {self.path}",
+                flush=True,
+            )
+
+        def log_message(self, *_args) -> None:
+            pass
+
+        def _send(self, status: int, payload: dict | None = None, headers: dict | None = None) -> None:
+            body = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            if payload is not None:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self) -> tuple[int, int]:
+            delay = args.latency + random.uniform(-args.jitter, args.jitter)
+            time.sleep(max(delay, 0) / 1000)
+
+            url = urlsplit(self.path)
+            if url.path.rstrip("/") != API_PATH:
+                self._send(404, {"error": "not found"})
+                return 404, 0
+
+            if random.random() < args.error_rate:
+                self._send(args.error_status, {"error": "simulated failure"})
+                return args.error_status, 0
+
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            try:
+                matches = parse_filter(query.get("$filter", ""))
+                top = int(query.get("$top", 100000))
+                skip = int(query.get("$skip", 0))
+            except ValueError as err:
+                self._send(400, {"error": str(err)})
+                return 400, 0
+
+            days = sorted({value for _, value in CONDITION.findall(query["$filter"])})
+            first, last = date.fromisoformat(days[0]), date.fromisoformat(days[-1])
+            rows = [
+                row
+                for offset in range((last - first).days + 1)
+                if matches(day := first + timedelta(days=offset))
+                for row in source.rows(day)
+            ]
+            if "$select" in query:
+                fields = query["$select"].split(",")
+                rows = [{key: row[key] for key in fields if key in row} for row in rows]
+
+            page = rows[skip:skip + min(top, args.page_size)]
+            payload = {"value": page}
+            if len(page) < top and skip + len(page) < len(rows):
+                next_query = {**query, "$skip": skip + len(page), "$top": top - len(page)}
+                host = self.headers.get("Host", f"127.0.0.1:{args.port}")
+                payload["@odata.nextLink"] = f"http://{host}{API_PATH}?{urlencode(next_query)}"
+
+            etag = '"' + hashlib.sha256(json.dumps(payload).encode()).hexdigest()[:32] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+                return 304, 0
+
+            self._send(200, payload, {"ETag": etag})
+            return 200, len(page)
+
+    return Handler
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--replay", help="directory of recorded payloads, replayed starting today")
+    parser.add_argument("--latency", type=float, default=0.0, help="added response time in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- ms on top of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--publish-at", type=dt_time.fromisoformat, default=dt_time(14, 0),
+                        help="local time at which tomorrow becomes available (HH:MM)")
+    parser.add_argument("--partial", type=int, default=0,
+                        help="rows of tomorrow served before --publish-at (0 = none)")
+    parser.add_argument("--dst", action="append", default=[], metavar="DATE:SLOTS",
+                        help="force the slot count of a day, e.g. 2025-06-14:92")
+    parser.add_argument("--page-size", type=int, default=1000, help="max rows per page before @odata.nextLink")
+    args = parser.parse_args()
+
+    stats = {"requests": 0}
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(Source(args), stats, threading.Lock())
+    )
+    print(f"PSE stand-in on http://{args.host}:{args.port}{API_PATH}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(stats, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,27 @@
 """The RCE (PSE) integration."""
 from __future__ import annotations
 
-from homeassistant.core import HomeAssistant
+from datetime import datetime, time, timedelta
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
+from homeassistant.util import dt as dt_util
 
 from .const import *
-from .coordinator import RCEDataUpdateCoordinator
+from .coordinator import (
+    RCEDataUpdateCoordinator,
+    battery_enabled,
+    data_source,
+    plan_slugs,
+    profile_slugs,
+)
 
-PLATFORMS = [Platform.SENSOR, Platform.BINARY_SENSOR]
+PLATFORMS = [Platform.SENSOR, Platform.BINARY_SENSOR, Platform.CALENDAR]
 
 async def async_setup(hass: HomeAssistant, config) -> bool:
     
@@ -28,8 +41,137 @@ async def async_setup(hass: HomeAssistant, config) -> bool:
         "set_operation_mode",
         set_mode,
     )
+
+    async def get_prices(call: ServiceCall) -> ServiceResponse:
+        coordinator = _get_coordinator(hass)
+        try:
+            return coordinator.prices_response(call.data.get("profile"))
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+
+    hass.services.async_register(
+        DOMAIN,
+        "get_prices",
+        get_prices,
+        schema=vol.Schema({vol.Optional("profile"): cv.string}),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def backfill(call: ServiceCall) -> ServiceResponse:
+        start, end = call.data["start_date"], call.data["end_date"]
+        if start > end:
+            raise HomeAssistantError("start_date must not be after end_date")
+        if (end - start).days >= BACKFILL_MAX_DAYS:
+            raise HomeAssistantError(f"Backfill is limited to {BACKFILL_MAX_DAYS} days")
+
+        coordinator = next(iter(hass.data.get(DOMAIN, {}).values()), None)
+        if coordinator is None:
+            raise HomeAssistantError("RCE integration is not loaded")
+        # odtwarzane dni mają przesunięte daty, nie mogą trafić do archiwum
+        _, replay_dir = coordinator.data_source
+        if replay_dir:
+            raise HomeAssistantError("Backfill is not available while replaying recorded prices")
+        return await coordinator.async_backfill(start, end)
+
+    hass.services.async_register(
+        DOMAIN,
+        "backfill",
+        backfill,
+        schema=vol.Schema({
+            vol.Required("start_date"): cv.date,
+            vol.Required("end_date"): cv.date,
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def find_cheapest_window(call: ServiceCall) -> ServiceResponse:
+        coordinator = _get_coordinator(hass)
+        profile = call.data.get("energy_profile")
+        duration = call.data.get("duration")
+
+        if profile is not None:
+            slots = len(profile)
+            if duration is not None and -(-duration // SLOT_DURATION) != slots:
+                raise HomeAssistantError("energy_profile must have one value per 15 minutes of duration")
+        elif duration is not None:
+            slots = -(-duration // SLOT_DURATION)
+        else:
+            raise HomeAssistantError("Either duration or energy_profile is required")
+
+        now = dt_util.now()
+        return coordinator.find_cheapest_window(
+            slots,
+            _resolve_time(call.data.get("earliest_start"), now),
+            _resolve_time(call.data.get("deadline"), now),
+            profile,
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        "find_cheapest_window",
+        find_cheapest_window,
+        schema=vol.Schema({
+            vol.Optional("duration"): cv.positive_time_period,
+            vol.Optional("earliest_start"): vol.Any(cv.datetime, cv.time),
+            vol.Optional("deadline"): vol.Any(cv.datetime, cv.time),
+            vol.Optional("energy_profile"): vol.All(
+                cv.ensure_list, [vol.All(vol.Coerce(float), vol.Range(min=0))], vol.Length(min=1)
+            ),
+        }),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def optimize_battery(call: ServiceCall) -> ServiceResponse:
+        coordinator = _get_coordinator(hass)
+        # procenty jak w opcjach, optimize_battery przyjmuje ułamki
+        overrides = {
+            field: call.data[field] / 100 if field in ("efficiency", "min_soc") else call.data[field]
+            for field in ("capacity_kwh", "charge_kw", "discharge_kw", "efficiency", "min_soc")
+            if field in call.data
+        }
+        try:
+            return await coordinator.async_optimize_battery(
+                call.data.get("soc"),
+                _resolve_time(call.data.get("deadline"), dt_util.now()),
+                **overrides,
+            )
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+
+    hass.services.async_register(
+        DOMAIN,
+        "optimize_battery",
+        optimize_battery,
+        schema=vol.Schema({
+            vol.Optional("soc"): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+            vol.Optional("deadline"): vol.Any(cv.datetime, cv.time),
+            vol.Optional("capacity_kwh"): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+            vol.Optional("charge_kw"): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+            vol.Optional("discharge_kw"): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+            vol.Optional("efficiency"): vol.All(vol.Coerce(float), vol.Range(min=1, max=100)),
+            vol.Optional("min_soc"): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+        }),
+        supports_response=SupportsResponse.ONLY,
+    )
     return True
 
+def _resolve_time(value, now: datetime) -> datetime | None:
+    """Aware datetime for a service field; a bare time means its next occurrence."""
+    if value is None:
+        return None
+    if isinstance(value, time):
+        result = datetime.combine(now.date(), value, now.tzinfo)
+        return result if result > now else result + timedelta(days=1)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return value
+
+def _get_coordinator(hass: HomeAssistant) -> RCEDataUpdateCoordinator:
+    coordinator = next(iter(hass.data.get(DOMAIN, {}).values()), None)
+    if coordinator is None or not coordinator.data:
+        raise HomeAssistantError("RCE data is not available yet")
+    return coordinator
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     if not entry.options:
@@ -57,17 +199,29 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
-    entry.async_on_unload(entry.add_update_listener(_reload))
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
     
     return True
 
-async def _reload(hass: HomeAssistant, entry: ConfigEntry):
-    await hass.config_entries.async_reload(entry.entry_id)
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry):
+    # zmiana opcji/trybu przelicza maski na posiadanych cenach, bez pobierania z PSE
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    # dodanie/usunięcie profilu lub planu zmienia listę encji, a zmiana źródła
+    # danych unieważnia pobrane ceny, więc wymagają przeładowania
+    if (
+        profile_slugs(entry.options) != coordinator.profile_slugs
+        or plan_slugs(entry.options) != coordinator.plan_slugs
+        or battery_enabled(entry.options) != coordinator.battery_enabled
+        or data_source(entry.options) != coordinator.data_source
+        or not coordinator.async_recompute()
+    ):
+        await hass.config_entries.async_reload(entry.entry_id)
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_shutdown()
     return unload_ok
     
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
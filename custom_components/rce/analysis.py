@@ -0,0 +1,712 @@
+"""Day analysis pipeline for the RCE integration.
+
+Turns price series and integration options into the coordinator data
+dict (masks, windows, stats, profiles). Like mask_engine it has no
+Home Assistant imports; time and slug handling are passed in.
+"""
+from __future__ import annotations
+
+import logging
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from math import ceil, fsum
+from statistics import median
+from typing import Callable, Sequence
+
+from .const import (
+    ARRAY_ATTRIBUTES,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_CHARGE_POWER,
+    CONF_BATTERY_DISCHARGE_POWER,
+    CONF_BATTERY_EFFICIENCY,
+    CONF_BATTERY_MIN_SOC,
+    CONF_CUSTOM_PEAK_HOURS_RANGE,
+    CONF_OPERATION_MODE,
+    CONF_PLAN_DEADLINE,
+    CONF_PLAN_EARLIEST,
+    CONF_PLAN_ENERGY,
+    CONF_PLAN_MAX_STARTS,
+    CONF_PLAN_MIN_RUN,
+    CONF_PLAN_POWER,
+    CONF_PLAN_PRIORITY,
+    CONF_PLANS,
+    CONF_PRICE_MODE,
+    CONF_PROFILE_NAME,
+    CONF_PROFILES,
+    CONF_SITE_POWER_CAP,
+    CONF_ROLLING_HORIZON,
+    CONF_TIME_RESOLUTION,
+    DEFAULT_OPERATION_MODE,
+    DEFAULT_PRICE_MODE,
+    DEFAULT_ROLLING_HORIZON,
+    DEFAULT_TIME_RESOLUTION,
+    PRICE_MODE_ALWAYS_ON,
+    PRICE_MODE_CHEAPEST_CONSECUTIVE,
+    RESOLUTION_15M,
+    SLOT_DURATION,
+    DEFAULT_BATTERY_CAPACITY,
+    DEFAULT_BATTERY_EFFICIENCY,
+    DEFAULT_BATTERY_MIN_SOC,
+    DEFAULT_BATTERY_POWER,
+    DEFAULT_PLAN_PRIORITY,
+    DEFAULT_SITE_POWER_CAP,
+)
+from .battery import optimize_battery
+from .mask_engine import build_windows, calculate_mask, cheapest_block, eligible_slots
+from .scheduler import plan_slots, slot_runs
+from .series import Bitmask, HourlySeries, as_list, price_array
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+def aggregate_hourly(prices: Sequence[float]) -> Sequence[float]:
+    """Hourly means, read back as 4 quarter-hour slots each (24 values stored)."""
+    if len(prices) != 96:
+        return prices
+
+    return HourlySeries(
+        price_array(
+            round(fsum(prices[i:i + 4]) / 4, 2)
+            for i in range(0, 96, 4)
+        )
+    )
+
+
+def options_mask(
+    prices: Sequence[float],
+    price_mode: str,
+    options: dict,
+    slot_hours: list[int] | None = None,
+) -> list[bool]:
+    """Translate options into mask_engine parameters.
+
+    slot_hours gives the hour of day of every slot; by default prices are
+    a single day starting at midnight.
+    """
+    factor = 4
+    res = options.get(CONF_TIME_RESOLUTION, DEFAULT_TIME_RESOLUTION)
+    peak_range = options.get(CONF_CUSTOM_PEAK_HOURS_RANGE, "00-24")
+
+    if slot_hours is None:
+        slot_hours = [i // factor for i in range(len(prices))]
+
+    if isinstance(prices, HourlySeries) and price_mode != PRICE_MODE_ALWAYS_ON:
+        # silnik indeksuje wielokrotnie, tymczasowa płaska kopia jest szybsza
+        prices = list(prices)
+
+    try:
+        start_h, end_h = map(int, peak_range.split("-"))
+        eligible = eligible_slots(slot_hours, start_h, end_h)
+    except Exception:
+        eligible = None
+
+    active_mode = options.get(CONF_OPERATION_MODE, "comfort").lower()
+
+    if price_mode == PRICE_MODE_CHEAPEST_CONSECUTIVE:
+        count = options.get("consecutive_ranges_count", 4)
+    else:
+        count = options.get("cheapest_not_consecutive_count", 4)
+    count *= 4 if res != RESOLUTION_15M else 1
+
+    return calculate_mask(
+        prices,
+        price_mode,
+        eligible=eligible,
+        percentile=options.get(f"{active_mode}_percentile", 30) / 100.0,
+        min_window=options.get(f"{active_mode}_min_window", 2) * factor,
+        count=count,
+        include_negative=options.get("negative_prices", False),
+    )
+
+
+def build_windows_data(
+    prices: Sequence[float],
+    mask: Sequence[bool],
+    prefix: Sequence[float] | None = None,
+) -> list[dict]:
+    """Build window statistics based on mask."""
+    if not prices or not mask:
+        return []
+
+    if len(prices) != len(mask):
+        _LOGGER.warning(
+            "Prices and mask length mismatch (%s vs %s)",
+            len(prices),
+            len(mask),
+        )
+        return []
+
+    return build_windows(prices, mask, prefix)
+
+
+def day_windows(prices: Sequence[float], opt: dict) -> list[dict]:
+    """Cheap windows of a single (e.g. archived) day with the main settings."""
+    if opt.get(CONF_TIME_RESOLUTION, DEFAULT_TIME_RESOLUTION) != RESOLUTION_15M:
+        prices = aggregate_hourly(prices)
+    mask = options_mask(prices, opt.get(CONF_PRICE_MODE, DEFAULT_PRICE_MODE), opt)
+    return build_windows_data(prices, mask)
+
+
+def find_window(
+    prices: Sequence[float],
+    series_start: datetime,
+    count: int,
+    start: int,
+    end: int,
+    energy_profile: Sequence[float] | None = None,
+) -> dict | None:
+    """Cheapest block of count consecutive slots inside prices[start:end].
+
+    energy_profile gives the kWh used in each slot of the job; prices are
+    PLN/MWh, so its cost is reported in PLN.
+    """
+    found = cheapest_block(prices, count, start, end, energy_profile)
+    if found is None:
+        return None
+
+    first, cost = found
+    segment = prices[first:first + count]
+    result = {
+        "start": series_start + timedelta(minutes=15 * first),
+        "end": series_start + timedelta(minutes=15 * (first + count)),
+        "slots": count,
+        "average_price": round(fsum(segment) / count, 2),
+        "min_price": min(segment),
+        "max_price": max(segment),
+    }
+    if energy_profile is not None:
+        result["energy_kwh"] = round(fsum(energy_profile), 3)
+        result["cost"] = round(cost / 1000, 2)
+    return result
+
+
+# ============================================================
+# DAY INDEX
+# ============================================================
+@dataclass(frozen=True, slots=True)
+class DayAnalysis:
+    """Read-only index over one day's prices and mask, built once per data change.
+
+    Entities answer from it with O(1) lookups instead of rescanning lists.
+    Prices and lookup tables are compact arrays and the mask a bitset;
+    none of them is mutated after construction.
+    """
+
+    prices: Sequence[float]
+    mask: Bitmask
+    prefix: array
+    argmin: int | None
+    windows: tuple[dict, ...]
+    ranked: tuple[dict, ...]
+    slot_window: array
+    next_window: array
+
+    @property
+    def best(self) -> dict | None:
+        return self.ranked[0] if self.ranked else None
+
+    def top(self, count: int = 3) -> list[dict]:
+        return list(self.ranked[:count])
+
+    def average(self, start: int, end: int) -> float:
+        return (self.prefix[end] - self.prefix[start]) / (end - start)
+
+    def is_cheap(self, slot: int) -> bool:
+        return 0 <= slot < len(self.mask) and self.mask[slot]
+
+    def window_at(self, slot: int) -> dict | None:
+        """Window covering slot, if any."""
+        if not 0 <= slot < len(self.slot_window):
+            return None
+        idx = self.slot_window[slot]
+        return self.windows[idx] if idx >= 0 else None
+
+    def upcoming(self, slot: int) -> dict | None:
+        """Window covering slot or, if none, the first one starting after it."""
+        if not 0 <= slot < len(self.next_window):
+            return None
+        idx = self.next_window[slot]
+        return self.windows[idx] if idx >= 0 else None
+
+
+EMPTY_DAY = DayAnalysis(
+    array("d"), Bitmask(), array("d", [0.0]), None, (), (), array("h"), array("h", [-1])
+)
+
+
+def build_day_analysis(prices: Sequence[float], mask: Sequence[bool]) -> DayAnalysis:
+    if not prices:
+        return EMPTY_DAY
+
+    n = len(prices)
+    prefix = array("d", [0.0])
+    prefix.extend(accumulate(prices))
+    windows = build_windows_data(prices, mask, prefix)
+
+    slot_window = array("h", [-1]) * n
+    for idx, window in enumerate(windows):
+        slot_window[window["start"]:window["end"]] = array("h", [idx]) * window["length"]
+
+    # first window ending after each slot, filled backwards
+    next_window = array("h", [-1]) * (n + 1)
+    for i in range(n - 1, -1, -1):
+        next_window[i] = slot_window[i] if slot_window[i] >= 0 else next_window[i + 1]
+
+    return DayAnalysis(
+        prices=prices,
+        mask=mask if isinstance(mask, Bitmask) else Bitmask.from_bools(mask),
+        prefix=prefix,
+        argmin=min(range(n), key=prices.__getitem__),
+        windows=tuple(windows),
+        ranked=tuple(sorted(windows, key=lambda x: x["avg"])),
+        slot_window=slot_window,
+        next_window=next_window,
+    )
+
+
+# ============================================================
+# ENERGY PLANS
+# ============================================================
+def time_slot(value: str) -> int:
+    """Quarter-hour slot of an "HH:MM[:SS]" time of day."""
+    hours, minutes = map(int, value.split(":")[:2])
+    return hours * 4 + minutes // 15
+
+
+def plan_slot_count(plan: dict) -> int:
+    return ceil(plan[CONF_PLAN_ENERGY] / (plan[CONF_PLAN_POWER] / 4) - 1e-9)
+
+
+def plan_cycles(
+    earliest: str, deadline: str, day_length: int, total: int
+) -> list[tuple[int, int, bool]]:
+    """(start, end, complete) of every plan cycle overlapping slots 0..total.
+
+    A cycle runs from earliest to the next deadline, overnight when the
+    deadline is earlier in the day. Cycles are clipped to the known
+    prices; complete is False when a part of the cycle is not known.
+    """
+    first, last = time_slot(earliest), time_slot(deadline)
+    length = (last - first) % 96 or 96
+
+    cycles = []
+    for base in (0, day_length, day_length + 96):
+        end = base + last
+        start = end - length
+        if end > 0 and start < total:
+            cycles.append((max(start, 0), min(end, total), start >= 0 and end <= total))
+    return cycles
+
+
+def energy_plan(
+    prices: Sequence[float],
+    day_length: int,
+    plan: dict,
+    eligible: Sequence[bool] | None = None,
+) -> dict:
+    """Cheapest slots delivering the plan's energy in each cycle.
+
+    prices start at today's midnight (today + tomorrow); eligible limits
+    the usable slots over the same series.
+    """
+    count = plan_slot_count(plan)
+    energy = plan[CONF_PLAN_ENERGY]
+    mask = [False] * len(prices)
+    cycles = []
+
+    for start, end, complete in plan_cycles(
+        plan[CONF_PLAN_EARLIEST], plan[CONF_PLAN_DEADLINE], day_length, len(prices)
+    ):
+        chosen = plan_slots(
+            prices[start:end],
+            count,
+            min_run=ceil(plan.get(CONF_PLAN_MIN_RUN, 15) / 15),
+            max_starts=plan.get(CONF_PLAN_MAX_STARTS, 0),
+            eligible=eligible[start:end] if eligible is not None else None,
+        )
+        cycle = {"start": start, "end": end, "complete": complete, "feasible": chosen is not None}
+
+        if chosen is not None:
+            picked = [prices[start + i] for i, on in enumerate(chosen) if on]
+            for i, on in enumerate(chosen):
+                if on:
+                    mask[start + i] = True
+            average = fsum(picked) / count
+            cycle.update(
+                runs=slot_runs(chosen, start),
+                average_price=round(average, 2),
+                cost=round(average * energy / 1000, 2),
+            )
+        cycles.append(cycle)
+
+    return {
+        "name": plan[CONF_PROFILE_NAME],
+        "energy_kwh": energy,
+        "power_kw": plan[CONF_PLAN_POWER],
+        "priority": plan.get(CONF_PLAN_PRIORITY, DEFAULT_PLAN_PRIORITY),
+        "slots": count,
+        "mask": Bitmask.from_bools(mask),
+        "cycles": cycles,
+    }
+
+
+def _plans_in_order(
+    prices: Sequence[float],
+    day_length: int,
+    plans: Sequence[dict],
+    order: Sequence[int],
+    site_cap: float,
+) -> dict[int, dict]:
+    """energy_plan of plans[i] for i in order, each within the headroom left."""
+    headroom = array("d", [site_cap]) * len(prices) if site_cap > 0 else None
+    results = {}
+
+    for i in order:
+        power = plans[i][CONF_PLAN_POWER]
+        eligible = None
+        if headroom is not None:
+            eligible = [free >= power - 1e-9 for free in headroom]
+
+        result = energy_plan(prices, day_length, plans[i], eligible)
+        if headroom is not None:
+            for slot, on in enumerate(result["mask"]):
+                if on:
+                    headroom[slot] -= power
+        results[i] = result
+
+    return results
+
+
+def _feasible_cycles(plan: dict) -> int:
+    return sum(cycle["feasible"] for cycle in plan["cycles"])
+
+
+def energy_plans(
+    prices: Sequence[float],
+    day_length: int,
+    plans: Sequence[dict],
+    site_cap: float = 0.0,
+) -> list[dict]:
+    """Best-effort plans of all loads under the site power cap (kW, 0 = none).
+
+    Loads are planned one at a time in priority order (1 first, ties in
+    the order they were added); each may only use slots where the power
+    still free under the cap covers it, and its chosen slots are then
+    taken from the headroom. This is greedy, not a joint optimum: an
+    earlier load may take the only slots a later one could use. A load
+    left with an infeasible cycle is therefore retried ahead of the
+    earlier loads, one position at a time, and the new order is kept if
+    it gains a feasible cycle while no other load loses one. Results are
+    returned in priority order.
+    """
+    ranked = sorted(plans, key=lambda p: p.get(CONF_PLAN_PRIORITY, DEFAULT_PLAN_PRIORITY))
+    order = list(range(len(ranked)))
+    results = _plans_in_order(prices, day_length, ranked, order, site_cap)
+
+    if site_cap > 0:
+        for k in range(len(ranked)):
+            if _feasible_cycles(results[k]) == len(results[k]["cycles"]):
+                continue
+
+            # wcześniejsze obciążenia planowane wokół slotów tego obciążenia
+            position = order.index(k)
+            for before in range(position - 1, -1, -1):
+                trial_order = order[:before] + [k] + [i for i in order[before:] if i != k]
+                trial = _plans_in_order(prices, day_length, ranked, trial_order, site_cap)
+                if _feasible_cycles(trial[k]) > _feasible_cycles(results[k]) and all(
+                    _feasible_cycles(trial[i]) >= _feasible_cycles(results[i]) for i in order
+                ):
+                    order, results = trial_order, trial
+                    break
+
+    return [results[i] for i in range(len(ranked))]
+
+
+def active_cycle(plan: dict, index: int) -> dict | None:
+    """First cycle of plan that has not ended at slot index."""
+    return next((c for c in plan.get("cycles", []) if c["end"] > index), None)
+
+
+# ============================================================
+# BATTERY ARBITRAGE
+# ============================================================
+def battery_settings(opt: dict) -> dict:
+    """optimize_battery keyword arguments from the options (percent -> fraction)."""
+    return {
+        "capacity_kwh": opt.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY),
+        "charge_kw": opt.get(CONF_BATTERY_CHARGE_POWER, DEFAULT_BATTERY_POWER),
+        "discharge_kw": opt.get(CONF_BATTERY_DISCHARGE_POWER, DEFAULT_BATTERY_POWER),
+        "efficiency": opt.get(CONF_BATTERY_EFFICIENCY, DEFAULT_BATTERY_EFFICIENCY) / 100,
+        "min_soc": opt.get(CONF_BATTERY_MIN_SOC, DEFAULT_BATTERY_MIN_SOC) / 100,
+    }
+
+
+# ============================================================
+# ANALYSIS
+# ============================================================
+def analyze(
+    prices_today: Sequence[float],
+    prices_tomorrow: Sequence[float] | None,
+    horizon_prices: Sequence[float],
+    horizon_hours: list[int],
+    horizon_start: datetime,
+    now_idx: int,
+    price_mode: str,
+    opt: dict,
+) -> dict:
+    """Masks and windows for one price mode / set of options.
+
+    Masks are computed as lists and packed into bitsets once final.
+    """
+
+    # -----------------------
+    # MASKS
+    # -----------------------
+    cheap_mask_today = options_mask(prices_today, price_mode, opt)
+
+    cheap_mask_tomorrow = (
+        options_mask(prices_tomorrow, price_mode, opt)
+        if prices_tomorrow
+        else []
+    )
+
+    # -----------------------
+    # ROLLING HORIZON
+    # -----------------------
+    split = len(prices_today) - now_idx
+
+    if opt.get(CONF_ROLLING_HORIZON, DEFAULT_ROLLING_HORIZON):
+        horizon_mask = options_mask(horizon_prices, price_mode, opt, horizon_hours)
+        # maski dzienne to rzut horyzontu; miniona część dnia zostaje bez zmian
+        cheap_mask_today = cheap_mask_today[:now_idx] + horizon_mask[:split]
+        cheap_mask_tomorrow = horizon_mask[split:]
+    else:
+        horizon_mask = cheap_mask_today[now_idx:] + cheap_mask_tomorrow
+
+    windows_horizon = build_windows_data(horizon_prices, horizon_mask)
+    for window in windows_horizon:
+        window["start_time"] = horizon_start + timedelta(minutes=15 * window["start"])
+        window["end_time"] = horizon_start + timedelta(minutes=15 * window["end"])
+    best_window_horizon = min(windows_horizon, key=lambda x: x["avg"], default=None)
+
+    # -----------------------
+    # WINDOWS ANALYSIS (one index per day)
+    # -----------------------
+    today = build_day_analysis(prices_today, Bitmask.from_bools(cheap_mask_today))
+    tomorrow = build_day_analysis(prices_tomorrow or [], Bitmask.from_bools(cheap_mask_tomorrow))
+
+    return {
+        "analysis_today": today,
+        "analysis_tomorrow": tomorrow,
+        "cheap_mask_today": today.mask,
+        "windows_today": list(today.windows),
+        "best_window_today": today.best,
+        "top_windows_today": today.top(3),
+        "cheap_mask_tomorrow": tomorrow.mask,
+        "best_window_tomorrow": tomorrow.best,
+        "top_windows_tomorrow": tomorrow.top(3),
+        "cheap_mask_horizon": Bitmask.from_bools(horizon_mask),
+        "windows_horizon": windows_horizon,
+        "best_window_horizon": best_window_horizon,
+    }
+
+
+def build_data(
+    prices_today: Sequence[float],
+    prices_tomorrow: Sequence[float] | None,
+    opt: dict,
+    now: datetime,
+    day_start: datetime,
+    profile_key: Callable[[str], str],
+    forecast_tomorrow: Sequence[float] | None = None,
+) -> dict:
+    """Prices, masks, windows and stats for today and tomorrow.
+
+    now is local wall time, day_start the UTC instant of today's local
+    midnight and profile_key maps a profile name to its data key. Only
+    the rolling horizon depends on now, which is its anchor: callers pass
+    the moment prices or options changed, not the current slot, so the
+    selection stays fixed while its windows run. Otherwise the horizon
+    starts at midnight and the result is a pure function of prices and
+    options.
+    forecast_tomorrow (15-minute slots) stands in for tomorrow
+    in the provisional keys until the real prices are known.
+    """
+    res = opt.get(CONF_TIME_RESOLUTION, DEFAULT_TIME_RESOLUTION)
+    price_mode = opt.get(CONF_PRICE_MODE, DEFAULT_PRICE_MODE)
+    operation_mode = opt.get(CONF_OPERATION_MODE, DEFAULT_OPERATION_MODE)
+    peak_range = opt.get(CONF_CUSTOM_PEAK_HOURS_RANGE, "00-24")
+
+    # -----------------------
+    # AGGREGATION 1H
+    # -----------------------
+    if res != RESOLUTION_15M:
+        prices_today = aggregate_hourly(prices_today)
+        if prices_tomorrow is not None:
+            prices_tomorrow = aggregate_hourly(prices_tomorrow)
+        if forecast_tomorrow is not None:
+            forecast_tomorrow = aggregate_hourly(forecast_tomorrow)
+
+    # -----------------------
+    # ROLLING HORIZON (now -> end of tomorrow)
+    # -----------------------
+    now_idx = min(max((now - day_start) // SLOT_DURATION, 0), len(prices_today))
+    if res != RESOLUTION_15M:
+        # w trybie 1h horyzont zaczyna się od pełnej godziny, bez niepełnej pierwszej godziny
+        now_idx -= now_idx % 4
+    if not opt.get(CONF_ROLLING_HORIZON, DEFAULT_ROLLING_HORIZON):
+        # bez przesuwanego horyzontu wynik nie zależy od bieżącego slotu
+        now_idx = 0
+    horizon_prices = price_array(prices_today[now_idx:])
+    horizon_prices.extend(prices_tomorrow or ())
+    horizon_hours = [i // 4 for i in range(now_idx, len(prices_today))] + [
+        i // 4 for i in range(len(prices_tomorrow or []))
+    ]
+    horizon_start = day_start + timedelta(minutes=15 * now_idx)
+
+    def run(mode: str, options: dict) -> dict:
+        return analyze(
+            prices_today,
+            prices_tomorrow,
+            horizon_prices,
+            horizon_hours,
+            horizon_start,
+            now_idx,
+            mode,
+            options,
+        )
+
+    main = run(price_mode, opt)
+
+    # -----------------------
+    # PROFILES (same prices, one pass)
+    # -----------------------
+    profiles = {}
+    for profile in opt.get(CONF_PROFILES, []):
+        profile_mode = profile.get(CONF_PRICE_MODE, price_mode)
+        result = run(profile_mode, {**opt, **profile})
+        result["name"] = profile[CONF_PROFILE_NAME]
+        result["price_mode"] = profile_mode
+        profiles[profile_key(profile[CONF_PROFILE_NAME])] = result
+
+    # -----------------------
+    # ENERGY PLANS (today + tomorrow from midnight)
+    # -----------------------
+    plans = {}
+    if opt.get(CONF_PLANS):
+        series = price_array(prices_today)
+        series.extend(prices_tomorrow or ())
+        for plan in energy_plans(
+            series,
+            len(prices_today),
+            opt[CONF_PLANS],
+            opt.get(CONF_SITE_POWER_CAP, DEFAULT_SITE_POWER_CAP),
+        ):
+            plans[profile_key(plan["name"])] = plan
+
+    # -----------------------
+    # BATTERY ARBITRAGE (horizon, starting at min SoC)
+    # -----------------------
+    battery = None
+    settings = battery_settings(opt)
+    if settings["capacity_kwh"] > 0:
+        battery = optimize_battery(horizon_prices, **settings)
+
+    # -----------------------
+    # PROVISIONAL TOMORROW (forecast until PSE publishes)
+    # -----------------------
+    provisional = not prices_tomorrow and bool(forecast_tomorrow)
+    if provisional:
+        forecast_mask = options_mask(forecast_tomorrow, price_mode, opt)
+        planning = build_day_analysis(forecast_tomorrow, Bitmask.from_bools(forecast_mask))
+    else:
+        planning = main["analysis_tomorrow"]
+
+    cheap_mask_today = main["cheap_mask_today"]
+    low_prices = [p for p, mask in zip(prices_today, cheap_mask_today) if mask]
+    max_low_price = max(low_prices) if low_prices else 0.0
+
+    return {
+        "api_status": "ok",
+        "price_mode": price_mode,
+        "operation_mode": operation_mode,
+        "peak_range": peak_range,
+        "prices_today": prices_today,
+        "prices_tomorrow": prices_tomorrow or price_array(()),
+        "day_start": day_start,
+        "horizon_start": horizon_start,
+        "prices_horizon": horizon_prices,
+        **main,
+        "profiles": profiles,
+        "plans": plans,
+        "battery": battery,
+        "tomorrow_provisional": provisional,
+        "prices_forecast_tomorrow": planning.prices,
+        "analysis_forecast_tomorrow": planning,
+        "cheap_mask_forecast_tomorrow": planning.mask,
+        "best_window_forecast_tomorrow": planning.best,
+        "top_windows_forecast_tomorrow": planning.top(3),
+        "resolution": res,
+        "stats": {
+            "average": round(fsum(prices_today) / len(prices_today), 2),
+            "min": min(prices_today),
+            "max": max(prices_today),
+            "median": round(median(prices_today), 2),
+            "max_low_price": max_low_price,
+        },
+    }
+
+
+# ============================================================
+# STATE ATTRIBUTES
+# ============================================================
+def idx_to_time(i, factor):
+    h = i // factor
+    m = (i % factor) * (60 // factor)
+    return f"{h:02d}:{m:02d}"
+
+
+def format_range(start, end, factor):
+    return f"{idx_to_time(start, factor)} - {idx_to_time(end, factor)}"
+
+
+def market_price_attributes(data: dict, compact: bool) -> dict:
+    """Attributes of the market price sensor; compact leaves out the arrays."""
+    stats = data.get("stats", {})
+    attrs = {
+        "price_mode": data.get("price_mode"),
+        "operation_mode": data.get("operation_mode"),
+        "peak_range": data.get("peak_range"),
+        "average": stats.get("average"),
+        "min": stats.get("min"),
+        "max": stats.get("max"),
+        "median": stats.get("median"),
+        "low_price_cutoff": data.get("low_price_cutoff"),
+    }
+
+    # w trybie kompaktowym tablice są dostępne tylko przez usługę rce.get_prices
+    if not compact:
+        attrs.update({key: as_list(data.get(key)) for key in ARRAY_ATTRIBUTES})
+
+    return attrs
+
+
+def top_windows_attributes(top: Sequence[dict], factor: int) -> dict:
+    """Attributes of the top 3 windows sensors."""
+    return {
+        "windows": [
+            {
+                "range": format_range(w["start"], w["end"], factor),
+                "avg_price": w["avg"],
+                "min_price": w["min"],
+                "max_price": w["max"],
+                "duration_slots": w["end"] - w["start"],
+            }
+            for w in top
+        ]
+    }
@@ -0,0 +1,93 @@
+"""Local archive of past RCE business days."""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+from datetime import date, timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import ARCHIVE_FILE
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RCEArchive:
+    """SQLite table with one row of raw 15-minute prices per business day.
+
+    All database access runs in the executor.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self._path = hass.config.path(STORAGE_DIR, ARCHIVE_FILE)
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path)
+        if not self._ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS days ("
+                " business_date TEXT PRIMARY KEY,"
+                " prices TEXT NOT NULL)"
+            )
+            self._ready = True
+        return conn
+
+    # ------------------------------------------------------------
+    # EXECUTOR JOBS
+    # ------------------------------------------------------------
+
+    def _store_day(self, business_date: str, prices: list[float]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO days VALUES (?, ?)",
+                (business_date, json.dumps(prices, separators=(",", ":"))),
+            )
+        conn.close()
+
+    def _get_days(self, start: str, end: str) -> dict[str, list[float]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT business_date, prices FROM days"
+                " WHERE business_date BETWEEN ? AND ? ORDER BY business_date",
+                (start, end),
+            ).fetchall()
+        conn.close()
+        return {day: json.loads(prices) for day, prices in rows}
+
+    def _stored_dates(self, start: str, end: str) -> set[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT business_date FROM days WHERE business_date BETWEEN ? AND ?",
+                (start, end),
+            ).fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    # ------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------
+
+    async def async_store_day(self, business_date: str, rows: list[dict]) -> None:
+        prices = [float(x["rce_pln"]) for x in rows]
+        try:
+            await self.hass.async_add_executor_job(self._store_day, business_date, prices)
+        except sqlite3.Error as err:
+            # archiwum jest dodatkiem, nie może blokować aktualizacji cen
+            _LOGGER.warning("RCE archive write failed (%s): %s", business_date, err)
+
+    async def async_get_days(self, start: date, end: date) -> dict[str, list[float]]:
+        """Archived prices keyed by business date, start and end inclusive."""
+        return await self.hass.async_add_executor_job(
+            self._get_days, start.isoformat(), end.isoformat()
+        )
+
+    async def async_missing_days(self, start: date, end: date) -> list[str]:
+        stored = await self.hass.async_add_executor_job(
+            self._stored_dates, start.isoformat(), end.isoformat()
+        )
+        days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        return [d.isoformat() for d in days if d.isoformat() not in stored]
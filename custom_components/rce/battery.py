@@ -0,0 +1,115 @@
+"""Home battery arbitrage for the RCE integration.
+
+Charge / idle / discharge schedule over a price series that maximises
+the arbitrage profit, solved as a dynamic programme over a discretized
+state of charge.
+"""
+from __future__ import annotations
+
+from array import array
+from math import ceil, sqrt
+from typing import Sequence
+
+INF = float("inf")
+
+IDLE, CHARGE, DISCHARGE = 0, 1, -1
+ACTIONS = {IDLE: "idle", CHARGE: "charge", DISCHARGE: "discharge"}
+
+
+def optimize_battery(
+    prices: Sequence[float],
+    capacity_kwh: float,
+    charge_kw: float,
+    discharge_kw: float,
+    efficiency: float = 0.9,
+    min_soc: float = 0.1,
+    initial_soc: float | None = None,
+    levels: int = 100,
+) -> dict:
+    """Most profitable schedule for prices in PLN/MWh per 15-minute slot.
+
+    The state of charge is split into `levels` steps; every slot either
+    charges or discharges at full power (clipped at the limits) or idles.
+    Losses are split evenly between charging and discharging (sqrt of the
+    round-trip efficiency). The battery starts at initial_soc (default
+    min_soc) and must end with at least as much, so the profit never comes
+    from simply emptying it. O(len(prices) * levels).
+    """
+    n = len(prices)
+    step = capacity_kwh / levels
+    eta = sqrt(efficiency)
+
+    low = min(ceil(min_soc * levels - 1e-9), levels)
+    start = low if initial_soc is None else min(max(round(initial_soc * levels), 0), levels)
+    up = max(1, round(charge_kw / 4 * eta / step))
+    down = max(1, round(discharge_kw / 4 / eta / step))
+
+    # poziom docelowy i zmiana poziomu dla każdej akcji
+    states = range(levels + 1)
+    charge_to = [min(s + up, levels) for s in states]
+    discharge_to = [max(s - down, low) if s > low else s for s in states]
+    charge_delta = [t - s for s, t in zip(states, charge_to)]
+    discharge_delta = [s - t for s, t in zip(states, discharge_to)]
+
+    # kWh from / to the grid per level of change
+    buy_kwh = step / eta
+    sell_kwh = step * eta
+
+    value = [0.0 if s >= start else INF for s in states]
+    decisions: list[bytes] = [b""] * n
+
+    for t in range(n - 1, -1, -1):
+        price = prices[t] / 1000
+        buy, sell = buy_kwh * price, sell_kwh * price
+        charged = [d * buy + value[j] for j, d in zip(charge_to, charge_delta)]
+        discharged = [value[j] - d * sell for j, d in zip(discharge_to, discharge_delta)]
+
+        best = []
+        decision = bytearray(levels + 1)
+        for s, (idle, c, d) in enumerate(zip(value, charged, discharged)):
+            if c < idle and c <= d:
+                best.append(c)
+                decision[s] = 1
+            elif d < idle:
+                best.append(d)
+                decision[s] = 2
+            else:
+                best.append(idle)
+        value = best
+        decisions[t] = bytes(decision)
+
+    actions = array("b", [IDLE]) * n
+    soc = array("d", [0.0]) * n
+    charged_kwh = discharged_kwh = 0.0
+    level = start
+    for t in range(n):
+        choice = decisions[t][level]
+        if choice == 1:
+            actions[t] = CHARGE
+            charged_kwh += charge_delta[level] * buy_kwh
+            level = charge_to[level]
+        elif choice == 2:
+            actions[t] = DISCHARGE
+            discharged_kwh += discharge_delta[level] * sell_kwh
+            level = discharge_to[level]
+        soc[t] = round(level * 100 / levels, 1)
+
+    return {
+        "actions": actions,
+        "soc": soc,
+        "initial_soc": round(start * 100 / levels, 1),
+        "profit": round(-value[start], 2) if n else 0.0,
+        "charged_kwh": round(charged_kwh, 2),
+        "discharged_kwh": round(discharged_kwh, 2),
+    }
+
+
+def action_runs(actions: Sequence[int]) -> list[tuple[int, int, int]]:
+    """(start, end, action) of every run of one action, end exclusive."""
+    runs = []
+    for i, action in enumerate(actions):
+        if runs and runs[-1][2] == action and runs[-1][1] == i:
+            runs[-1] = (runs[-1][0], i + 1, action)
+        else:
+            runs.append((i, i + 1, action))
+    return runs
@@ -7,9 +7,10 @@ from homeassistant.components.binary_sensor import (
     BinarySensorEntity,
     BinarySensorEntityDescription,
 )
-from homeassistant.util import dt as dt_util
+from homeassistant.util import dt as dt_util, slugify
 
-from .const import DOMAIN, RESOLUTION_15M
+from .analysis import active_cycle
+from .const import CONF_PLANS, CONF_PROFILES, CONF_PROFILE_NAME, DOMAIN, SLOT_DURATION
 from .entity import RCEBaseEntity
 
 
@@ -29,6 +30,16 @@ BINARY_SENSORS: tuple[RCEBinarySensorDescription, ...] = (
     ),
 )
 
+PROFILE_LOW_PRICE = RCEBinarySensorDescription(
+    key="low_price",
+    translation_key="low_price_profile",
+)
+
+PLAN = RCEBinarySensorDescription(
+    key="plan",
+    translation_key="plan",
+)
+
 
 async def async_setup_entry(hass, entry, async_add_entities):
     coordinator = hass.data[DOMAIN][entry.entry_id]
@@ -53,6 +64,26 @@ async def async_setup_entry(hass, entry, async_add_entities):
                 )
             )
 
+    for profile in entry.options.get(CONF_PROFILES, []):
+        entities.append(
+            RCEProfileCheapNowBinarySensor(
+                coordinator=coordinator,
+                entry_id=entry.entry_id,
+                description=PROFILE_LOW_PRICE,
+                profile_name=profile[CONF_PROFILE_NAME],
+            )
+        )
+
+    for plan in entry.options.get(CONF_PLANS, []):
+        entities.append(
+            RCEPlanBinarySensor(
+                coordinator=coordinator,
+                entry_id=entry.entry_id,
+                description=PLAN,
+                plan_name=plan[CONF_PROFILE_NAME],
+            )
+        )
+
     async_add_entities(entities)
 
 
@@ -69,26 +100,24 @@ class RCEBinarySensorBase(RCEBaseEntity, BinarySensorEntity):
 class RCECheapNowBinarySensor(RCEBinarySensorBase):
     """Binary sensor: cheap price now."""
 
+    _slot_dependent = True
+
     @property
     def is_on(self) -> bool | None:
         data = self.coordinator.data
         if not data:
             return None
             
-        mask = data.get("cheap_mask_today")
-        if not mask:
+        # maska zawsze ma sloty 15-min (w trybie 1h każda godzina jest powtórzona 4x)
+        day, index = self._day_slot()
+        analysis = self._get_source(data).get(f"analysis_{day}")
+        if analysis is None or not analysis.mask:
             return None
 
-        res = data.get("resolution", RESOLUTION_15M)
-        factor = 4 if res == RESOLUTION_15M else 1
+        return analysis.is_cheap(index)
 
-        now = dt_util.now()
-        idx = now.hour * factor + (now.minute // (60 // factor))
-
-        if 0 <= idx < len(mask):
-            return bool(mask[idx])
-
-        return False
+    def _get_source(self, data):
+        return data
 
     @property
     def extra_state_attributes(self):
@@ -96,6 +125,86 @@ class RCECheapNowBinarySensor(RCEBinarySensorBase):
         return {"info": self.coordinator.data.get("api_status", "unknown")}
 
 
+class RCEProfileCheapNowBinarySensor(RCECheapNowBinarySensor):
+    """Binary sensor: cheap price now for a named appliance profile."""
+
+    def __init__(self, coordinator, entry_id: str, description, profile_name: str):
+        super().__init__(coordinator, entry_id, description)
+        self._profile = slugify(profile_name)
+        self._attr_translation_placeholders = {"profile": profile_name}
+        self.entity_id = f"binary_sensor.rce_{description.key}_{self._profile}"
+        self._attr_unique_id = f"{entry_id}_{description.key}_{self._profile}"
+
+    def _get_source(self, data):
+        return data.get("profiles", {}).get(self._profile, {})
+
+    @property
+    def extra_state_attributes(self):
+        profile = self._get_source(self.coordinator.data or {})
+        return {
+            "info": self.coordinator.data.get("api_status", "unknown"),
+            "price_mode": profile.get("price_mode"),
+            "best_window_today": profile.get("best_window_today"),
+            "best_window_tomorrow": profile.get("best_window_tomorrow"),
+            "windows_today": len(profile.get("windows_today") or []),
+        }
+
+
+class RCEPlanBinarySensor(RCEBinarySensorBase):
+    """Binary sensor: an energy plan schedules its load in the current slot."""
+
+    _slot_dependent = True
+    _quarter_hour = True
+
+    def __init__(self, coordinator, entry_id: str, description, plan_name: str):
+        super().__init__(coordinator, entry_id, description)
+        self._plan = slugify(plan_name)
+        self._attr_translation_placeholders = {"plan": plan_name}
+        self.entity_id = f"binary_sensor.rce_{description.key}_{self._plan}"
+        self._attr_unique_id = f"{entry_id}_{description.key}_{self._plan}"
+
+    def _get_plan(self) -> dict:
+        return (self.coordinator.data or {}).get("plans", {}).get(self._plan, {})
+
+    @property
+    def is_on(self) -> bool | None:
+        mask = self._get_plan().get("mask")
+        # maska planu obejmuje dziś + jutro od północy
+        index = self._slot_index()
+        if mask is None or index >= len(mask):
+            return None
+        return mask[index]
+
+    @property
+    def extra_state_attributes(self):
+        plan = self._get_plan()
+        cycle = active_cycle(plan, self._slot_index())
+        if cycle is None:
+            return {"info": self.coordinator.data.get("api_status", "unknown")}
+
+        day_start = self.coordinator.data["day_start"]
+
+        def at(index: int) -> str:
+            return dt_util.as_local(day_start + SLOT_DURATION * index).isoformat()
+
+        return {
+            "info": self.coordinator.data.get("api_status", "unknown"),
+            "energy_kwh": plan["energy_kwh"],
+            "power_kw": plan["power_kw"],
+            "priority": plan["priority"],
+            "slots": plan["slots"],
+            "cycle_start": at(cycle["start"]),
+            "cycle_end": at(cycle["end"]),
+            "complete": cycle["complete"],
+            "feasible": cycle["feasible"],
+            "runs": [
+                {"start": at(start), "end": at(end)} for start, end in cycle.get("runs", [])
+            ],
+            "average_price": cycle.get("average_price"),
+            "cost": cycle.get("cost"),
+        }
+
+
 class RCETomorrowDataAvailableBinarySensor(RCEBinarySensorBase):
     """Binary sensor: tomorrow data available."""
 
@@ -0,0 +1,66 @@
+"""Calendar of cheap energy windows for RCE (PSE)."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import DEFAULT_CURRENCY, DEFAULT_PRICE_TYPE, DOMAIN
+from .entity import RCEBaseEntity
+from .window_index import TimedWindow
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    async_add_entities([RCECheapWindowsCalendar(coordinator, entry.entry_id)])
+
+
+def window_event(window: TimedWindow) -> CalendarEvent:
+    unit = f"{DEFAULT_CURRENCY}/{DEFAULT_PRICE_TYPE}"
+    return CalendarEvent(
+        start=dt_util.as_local(window.start),
+        end=dt_util.as_local(window.end),
+        summary=f"Cheap energy ({window.avg:.2f} {unit})",
+        description=f"Average {window.avg} {unit}, min {window.min}, max {window.max}",
+    )
+
+
+class RCECheapWindowsCalendar(RCEBaseEntity, CalendarEntity):
+    """Cheap windows of today, tomorrow and archived days as events."""
+
+    _attr_translation_key = "cheap_windows"
+    # bieżące / następne okno zmienia się wraz ze slotem
+    _slot_dependent = True
+
+    def __init__(self, coordinator, entry_id: str):
+        super().__init__(coordinator, entry_id)
+        self.entity_id = "calendar.rce_cheap_windows"
+        self._attr_unique_id = f"{entry_id}_cheap_windows"
+
+    @property
+    def event(self) -> CalendarEvent | None:
+        window = self.coordinator.window_index().current_or_next(dt_util.utcnow())
+        return window_event(window) if window else None
+
+    async def async_get_events(
+        self, hass: HomeAssistant, start_date: datetime, end_date: datetime
+    ) -> list[CalendarEvent]:
+        windows = self.coordinator.window_index().between(start_date, end_date)
+
+        # dni sprzed dzisiaj pochodzą z lokalnego archiwum
+        day_start = (self.coordinator.data or {}).get("day_start")
+        if day_start is not None and start_date < day_start:
+            first = dt_util.as_local(start_date).date()
+            last = min(
+                dt_util.as_local(end_date).date(),
+                dt_util.as_local(day_start).date() - timedelta(days=1),
+            )
+            if first <= last:
+                archived = await self.coordinator.async_archived_windows(first, last)
+                windows = [
+                    w for w in archived if w.end > start_date and w.start < end_date
+                ] + windows
+
+        return [window_event(window) for window in windows]
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import os
 import voluptuous as vol
 import re
 from homeassistant import config_entries
 from homeassistant.core import callback
+from homeassistant.util import slugify
 
 from .const import (
     DOMAIN,
@@ -23,6 +25,44 @@ from .const import (
     DEFAULT_OPERATION_MODE,
     CONF_CONSECUTIVE_COUNT,
     CONF_NOT_CONSECUTIVE_COUNT,
+    CONF_ROLLING_HORIZON,
+    DEFAULT_ROLLING_HORIZON,
+    CONF_PROFILES,
+    CONF_PROFILE_NAME,
+    CONF_COMPACT_ATTRIBUTES,
+    DEFAULT_COMPACT_ATTRIBUTES,
+    CONF_API_URL,
+    CONF_REPLAY_DIR,
+    DEFAULT_API_URL,
+    CONF_PLANS,
+    CONF_PLAN_ENERGY,
+    CONF_PLAN_POWER,
+    CONF_PLAN_EARLIEST,
+    CONF_PLAN_DEADLINE,
+    CONF_PLAN_MIN_RUN,
+    CONF_PLAN_MAX_STARTS,
+    CONF_PLAN_PRIORITY,
+    CONF_SITE_POWER_CAP,
+    DEFAULT_PLAN_PRIORITY,
+    DEFAULT_SITE_POWER_CAP,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_CHARGE_POWER,
+    CONF_BATTERY_DISCHARGE_POWER,
+    CONF_BATTERY_EFFICIENCY,
+    CONF_BATTERY_MIN_SOC,
+    DEFAULT_BATTERY_CAPACITY,
+    DEFAULT_BATTERY_POWER,
+    DEFAULT_BATTERY_EFFICIENCY,
+    DEFAULT_BATTERY_MIN_SOC,
+)
+from .analysis import plan_slot_count, time_slot
+
+BATTERY_KEYS = (
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_CHARGE_POWER,
+    CONF_BATTERY_DISCHARGE_POWER,
+    CONF_BATTERY_EFFICIENCY,
+    CONF_BATTERY_MIN_SOC,
 )
 
 def validate_hour_range(value: str) -> bool:
@@ -37,6 +77,11 @@ def validate_hour_range(value: str) -> bool:
         return False
 
 
+def validate_time_of_day(value: str) -> bool:
+    match = re.match(r"^(\d{1,2}):(\d{2})(:\d{2})?$", value)
+    return bool(match) and int(match[1]) < 24 and int(match[2]) < 60
+
+
 class RCEConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
@@ -64,6 +109,20 @@ class RCEOptionsFlowHandler(config_entries.OptionsFlow):
         super().__init__()
 
     async def async_step_init(self, user_input=None):
+        return self.async_show_menu(
+            step_id="init",
+            menu_options=[
+                "settings",
+                "add_profile",
+                "remove_profile",
+                "add_plan",
+                "remove_plan",
+                "battery",
+                "data_source",
+            ],
+        )
+
+    async def async_step_settings(self, user_input=None):
         errors = {}
         options = self.config_entry.options
 
@@ -71,6 +130,11 @@ class RCEOptionsFlowHandler(config_entries.OptionsFlow):
             if not validate_hour_range(user_input.get(CONF_CUSTOM_PEAK_HOURS_RANGE, "")):
                 errors[CONF_CUSTOM_PEAK_HOURS_RANGE] = "invalid_hour_range"
             else:
+                # profile, plany, magazyn i źródło danych są zarządzane osobnymi krokami
+                user_input[CONF_PROFILES] = options.get(CONF_PROFILES, [])
+                for key in (CONF_PLANS, *BATTERY_KEYS, CONF_API_URL, CONF_REPLAY_DIR):
+                    if key in options:
+                        user_input[key] = options[key]
                 return self.async_create_entry(title="", data=user_input)
 
         current_settings = (
@@ -97,11 +161,176 @@ class RCEOptionsFlowHandler(config_entries.OptionsFlow):
             vol.Required("aggressive_min_window", default=options.get("aggressive_min_window", 1)): vol.All(vol.Coerce(int), vol.Range(min=1, max=24)),
             vol.Required(CONF_NEGATIVE_PRICES, default=options.get(CONF_NEGATIVE_PRICES, DEFAULT_NEGATIVE_PRICES)): bool,
             vol.Required(CONF_CUSTOM_PEAK_HOURS_RANGE, default=options.get(CONF_CUSTOM_PEAK_HOURS_RANGE, DEFAULT_CUSTOM_PEAK_HOURS_RANGE)): str,
+            vol.Required(CONF_ROLLING_HORIZON, default=options.get(CONF_ROLLING_HORIZON, DEFAULT_ROLLING_HORIZON)): bool,
+            vol.Required(CONF_COMPACT_ATTRIBUTES, default=options.get(CONF_COMPACT_ATTRIBUTES, DEFAULT_COMPACT_ATTRIBUTES)): bool,
+            vol.Required(CONF_SITE_POWER_CAP, default=options.get(CONF_SITE_POWER_CAP, DEFAULT_SITE_POWER_CAP)): vol.All(vol.Coerce(float), vol.Range(min=0, max=1000)),
         })
 
         return self.async_show_form(
-            step_id="init",
+            step_id="settings",
             data_schema=schema,
             errors=errors,
             description_placeholders={"current_status": current_settings}
         )
+
+    async def async_step_add_profile(self, user_input=None):
+        errors = {}
+        options = self.config_entry.options
+        profiles = options.get(CONF_PROFILES, [])
+
+        if user_input is not None:
+            slug = slugify(user_input[CONF_PROFILE_NAME])
+            if not slug:
+                errors[CONF_PROFILE_NAME] = "invalid_profile_name"
+            elif slug in {slugify(p[CONF_PROFILE_NAME]) for p in profiles}:
+                errors[CONF_PROFILE_NAME] = "profile_exists"
+            else:
+                return self.async_create_entry(
+                    title="",
+                    data={**options, CONF_PROFILES: [*profiles, user_input]},
+                )
+
+        schema = vol.Schema({
+            vol.Required(CONF_PROFILE_NAME): str,
+            vol.Required(CONF_PRICE_MODE, default=options.get(CONF_PRICE_MODE, DEFAULT_PRICE_MODE)): vol.In(PRICE_MODES),
+            vol.Required(CONF_OPERATION_MODE, default=options.get(CONF_OPERATION_MODE, DEFAULT_OPERATION_MODE)): vol.In(OPERATION_MODES),
+            vol.Required(CONF_CONSECUTIVE_COUNT, default=options.get(CONF_CONSECUTIVE_COUNT, 4)): vol.All(vol.Coerce(int), vol.Range(min=1, max=48)),
+            vol.Required(CONF_NOT_CONSECUTIVE_COUNT, default=options.get(CONF_NOT_CONSECUTIVE_COUNT, 4)): vol.All(vol.Coerce(int), vol.Range(min=1, max=96)),
+        })
+
+        return self.async_show_form(
+            step_id="add_profile", data_schema=schema, errors=errors
+        )
+
+    async def async_step_add_plan(self, user_input=None):
+        errors = {}
+        options = self.config_entry.options
+        plans = options.get(CONF_PLANS, [])
+
+        if user_input is not None:
+            slug = slugify(user_input[CONF_PROFILE_NAME])
+            if not slug:
+                errors[CONF_PROFILE_NAME] = "invalid_profile_name"
+            elif slug in {slugify(p[CONF_PROFILE_NAME]) for p in plans}:
+                errors[CONF_PROFILE_NAME] = "plan_exists"
+            elif not validate_time_of_day(user_input[CONF_PLAN_EARLIEST]):
+                errors[CONF_PLAN_EARLIEST] = "invalid_time"
+            elif not validate_time_of_day(user_input[CONF_PLAN_DEADLINE]):
+                errors[CONF_PLAN_DEADLINE] = "invalid_time"
+            else:
+                # długość cyklu (przez północ, gdy deadline jest wcześniej)
+                length = (
+                    time_slot(user_input[CONF_PLAN_DEADLINE])
+                    - time_slot(user_input[CONF_PLAN_EARLIEST])
+                ) % 96 or 96
+                if plan_slot_count(user_input) > length:
+                    errors["base"] = "plan_too_long"
+                else:
+                    return self.async_create_entry(
+                        title="",
+                        data={**options, CONF_PLANS: [*plans, user_input]},
+                    )
+
+        schema = vol.Schema({
+            vol.Required(CONF_PROFILE_NAME): str,
+            vol.Required(CONF_PLAN_ENERGY, default=10.0): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=500)),
+            vol.Required(CONF_PLAN_POWER, default=3.7): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=100)),
+            vol.Required(CONF_PLAN_EARLIEST, default="22:00"): str,
+            vol.Required(CONF_PLAN_DEADLINE, default="07:00"): str,
+            vol.Required(CONF_PLAN_MIN_RUN, default=15): vol.All(vol.Coerce(int), vol.Range(min=15, max=1440)),
+            vol.Required(CONF_PLAN_MAX_STARTS, default=0): vol.All(vol.Coerce(int), vol.Range(min=0, max=48)),
+            vol.Required(CONF_PLAN_PRIORITY, default=DEFAULT_PLAN_PRIORITY): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+        })
+
+        return self.async_show_form(
+            step_id="add_plan", data_schema=schema, errors=errors
+        )
+
+    async def async_step_remove_plan(self, user_input=None):
+        options = self.config_entry.options
+        plans = options.get(CONF_PLANS, [])
+
+        if not plans:
+            return self.async_abort(reason="no_plans")
+
+        if user_input is not None:
+            return self.async_create_entry(
+                title="",
+                data={
+                    **options,
+                    CONF_PLANS: [
+                        p for p in plans
+                        if p[CONF_PROFILE_NAME] != user_input[CONF_PROFILE_NAME]
+                    ],
+                },
+            )
+
+        schema = vol.Schema({
+            vol.Required(CONF_PROFILE_NAME): vol.In([p[CONF_PROFILE_NAME] for p in plans]),
+        })
+
+        return self.async_show_form(step_id="remove_plan", data_schema=schema)
+
+    async def async_step_battery(self, user_input=None):
+        options = self.config_entry.options
+
+        if user_input is not None:
+            return self.async_create_entry(title="", data={**options, **user_input})
+
+        schema = vol.Schema({
+            vol.Required(CONF_BATTERY_CAPACITY, default=options.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY)): vol.All(vol.Coerce(float), vol.Range(min=0, max=1000)),
+            vol.Required(CONF_BATTERY_CHARGE_POWER, default=options.get(CONF_BATTERY_CHARGE_POWER, DEFAULT_BATTERY_POWER)): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=500)),
+            vol.Required(CONF_BATTERY_DISCHARGE_POWER, default=options.get(CONF_BATTERY_DISCHARGE_POWER, DEFAULT_BATTERY_POWER)): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=500)),
+            vol.Required(CONF_BATTERY_EFFICIENCY, default=options.get(CONF_BATTERY_EFFICIENCY, DEFAULT_BATTERY_EFFICIENCY)): vol.All(vol.Coerce(int), vol.Range(min=50, max=100)),
+            vol.Required(CONF_BATTERY_MIN_SOC, default=options.get(CONF_BATTERY_MIN_SOC, DEFAULT_BATTERY_MIN_SOC)): vol.All(vol.Coerce(int), vol.Range(min=0, max=90)),
+        })
+
+        return self.async_show_form(step_id="battery", data_schema=schema)
+
+    async def async_step_data_source(self, user_input=None):
+        errors = {}
+        options = self.config_entry.options
+
+        if user_input is not None:
+            replay_dir = user_input.get(CONF_REPLAY_DIR)
+            if replay_dir and not await self.hass.async_add_executor_job(
+                os.path.isdir, replay_dir
+            ):
+                errors[CONF_REPLAY_DIR] = "invalid_replay_dir"
+            else:
+                data = {k: v for k, v in options.items() if k != CONF_REPLAY_DIR}
+                return self.async_create_entry(title="", data={**data, **user_input})
+
+        schema = vol.Schema({
+            vol.Required(CONF_API_URL, default=options.get(CONF_API_URL, DEFAULT_API_URL)): vol.Url(),
+            vol.Optional(CONF_REPLAY_DIR, description={"suggested_value": options.get(CONF_REPLAY_DIR)}): str,
+        })
+
+        return self.async_show_form(
+            step_id="data_source", data_schema=schema, errors=errors
+        )
+
+    async def async_step_remove_profile(self, user_input=None):
+        options = self.config_entry.options
+        profiles = options.get(CONF_PROFILES, [])
+
+        if not profiles:
+            return self.async_abort(reason="no_profiles")
+
+        if user_input is not None:
+            return self.async_create_entry(
+                title="",
+                data={
+                    **options,
+                    CONF_PROFILES: [
+                        p for p in profiles
+                        if p[CONF_PROFILE_NAME] != user_input[CONF_PROFILE_NAME]
+                    ],
+                },
+            )
+
+        schema = vol.Schema({
+            vol.Required(CONF_PROFILE_NAME): vol.In([p[CONF_PROFILE_NAME] for p in profiles]),
+        })
+
+        return self.async_show_form(step_id="remove_profile", data_schema=schema)
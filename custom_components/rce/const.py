@@ -14,6 +14,43 @@ _LOGGER = logging.getLogger(__name__)
 # GENERAL SETTINGS
 # =========================================================
 SCAN_INTERVAL = timedelta(minutes=15)
+DEFAULT_API_URL: Final = "https://api.raporty.pse.pl/api/rce-pln"
+# $top caps the whole OData result (all pages), so it is sized per range;
+# a business day has at most 100 quarter-hours (DST change in October)
+MAX_DAY_SLOTS: Final = 100
+REQUEST_TIMEOUT: Final = 20
+SLOT_DURATION: Final = timedelta(minutes=15)
+
+EVENT_WINDOW_STARTED: Final = "rce_window_started"
+EVENT_WINDOW_ENDED: Final = "rce_window_ended"
+WINDOW_CACHE_SIZE: Final = 64
+
+# =========================================================
+# POLLING SCHEDULE
+# =========================================================
+# PSE publishes tomorrow's prices in the early afternoon
+TOMORROW_PUBLICATION_HOUR: Final = 13
+PUBLICATION_POLL_INTERVAL = timedelta(minutes=5)
+MAX_PUBLICATION_POLL_INTERVAL = timedelta(hours=1)
+RETRY_INTERVAL = timedelta(minutes=1)
+MAX_RETRY_INTERVAL = timedelta(minutes=30)
+ROLLOVER_DELAY = timedelta(seconds=5)
+
+# Published PSE business days never change, so they are kept on disk
+STORAGE_VERSION: Final = 1
+STORAGE_KEY: Final = f"{DOMAIN}.day_cache"
+CACHE_SAVE_DELAY: Final = 10
+
+# Past days are archived in SQLite for statistics and backtests
+ARCHIVE_FILE: Final = "rce_archive.db"
+FORECAST_HISTORY_DAYS: Final = 28
+CALENDAR_ARCHIVE_CACHE_DAYS: Final = 400
+BACKFILL_BATCH_SIZE: Final = 31
+BACKFILL_BATCH_DELAY: Final = 2
+BACKFILL_MAX_DAYS: Final = 366
+
+# 92 / 100 slots on DST change days, 96 otherwise
+DAY_SLOT_COUNTS: Final = (92, 96, 100)
 
 DEFAULT_CURRENCY: Final = "PLN"
 DEFAULT_PRICE_TYPE: Final = "MWh"
@@ -34,6 +71,33 @@ CONF_PRICE_MODE: Final = "price_mode"
 CONF_OPERATION_MODE: Final = "operation_mode"
 CONF_CUSTOM_PEAK_HOURS_RANGE: Final = "custom_peak_hours_range"
 CONF_NEGATIVE_PRICES: Final = "negative_prices"
+CONF_ROLLING_HORIZON: Final = "rolling_horizon"
+CONF_COMPACT_ATTRIBUTES: Final = "compact_attributes"
+
+# źródło danych: inny serwer (np. benchmarks/pse_standin.py) albo nagrane odpowiedzi
+CONF_API_URL: Final = "api_url"
+CONF_REPLAY_DIR: Final = "replay_dir"
+
+CONF_PROFILES: Final = "profiles"
+CONF_PROFILE_NAME: Final = "name"
+
+# energy plans: required kWh by a deadline
+CONF_PLANS: Final = "plans"
+CONF_PLAN_ENERGY: Final = "energy_kwh"
+CONF_PLAN_POWER: Final = "power_kw"
+CONF_PLAN_EARLIEST: Final = "earliest_start"
+CONF_PLAN_DEADLINE: Final = "deadline"
+CONF_PLAN_MIN_RUN: Final = "min_run_minutes"
+CONF_PLAN_MAX_STARTS: Final = "max_starts"
+CONF_PLAN_PRIORITY: Final = "priority"
+CONF_SITE_POWER_CAP: Final = "site_power_cap_kw"
+
+# Magazyn energii (arbitraż)
+CONF_BATTERY_CAPACITY: Final = "battery_capacity_kwh"
+CONF_BATTERY_CHARGE_POWER: Final = "battery_charge_kw"
+CONF_BATTERY_DISCHARGE_POWER: Final = "battery_discharge_kw"
+CONF_BATTERY_EFFICIENCY: Final = "battery_efficiency"
+CONF_BATTERY_MIN_SOC: Final = "battery_min_soc"
 
 CONF_CONSECUTIVE_COUNT: Final = "consecutive_ranges_count"
 CONF_NOT_CONSECUTIVE_COUNT: Final = "cheapest_not_consecutive_count"
@@ -45,6 +109,14 @@ DEFAULT_PRICE_MODE: Final = "LOW PRICE CUTOFF"
 DEFAULT_OPERATION_MODE: Final = "comfort"
 DEFAULT_CUSTOM_PEAK_HOURS_RANGE: Final = "00-24"
 DEFAULT_NEGATIVE_PRICES: Final = True
+DEFAULT_ROLLING_HORIZON: Final = False
+DEFAULT_COMPACT_ATTRIBUTES: Final = False
+DEFAULT_PLAN_PRIORITY: Final = 1
+DEFAULT_SITE_POWER_CAP: Final = 0.0
+DEFAULT_BATTERY_CAPACITY: Final = 0.0
+DEFAULT_BATTERY_POWER: Final = 3.0
+DEFAULT_BATTERY_EFFICIENCY: Final = 90
+DEFAULT_BATTERY_MIN_SOC: Final = 10
 
 # =========================================================
 # OPERATION MODES (Presets dla Low Price Cutoff)
@@ -80,4 +152,11 @@ PRICE_MODES = [
 # SENSOR ATTRIBUTES
 # =========================================================
 ATTR_RESOLUTION = "resolution"
+# full day arrays; never recorded, dropped from state in compact mode
+ARRAY_ATTRIBUTES: Final = (
+    "prices_today",
+    "cheap_mask_today",
+    "prices_tomorrow",
+    "cheap_mask_tomorrow",
+)
 ATTR_PRICE_MODE = "price_mode"
@@ -1,42 +1,171 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
-import requests
-from datetime import timedelta
-from statistics import mean, median
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from functools import partial
+from typing import NamedTuple
 
+import aiohttp
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.device_registry import DeviceEntryType
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import (
+    async_track_point_in_utc_time,
+    async_track_time_change,
+)
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
 )
-from homeassistant.util import dt as dt_util
+from homeassistant.util import dt as dt_util, slugify
 
+from .archive import RCEArchive
 from .const import *
+from .analysis import battery_settings, build_data, day_windows, find_window
+from .battery import ACTIONS, action_runs, optimize_battery
+from .forecast import Forecast, forecast_day
+from .replay import read_replay_range
+from .series import as_list, price_array
+from .window_index import SLOT, TimedWindow, WindowIndex, merge_adjacent, timed_windows
 
 _LOGGER = logging.getLogger(__name__)
 
 URL = (
-    "https://api.raporty.pse.pl/api/rce-pln"
-    "?$filter=business_date eq '{day}'"
-    "&$select=dtime,rce_pln"
+    "{base}"
+    "?$filter=business_date ge '{start}' and business_date le '{end}'"
+    "&$select=business_date,dtime,rce_pln"
     "&$orderby=dtime"
+    "&$top={top}"
 )
 
 
+def battery_enabled(options) -> bool:
+    return options.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY) > 0
+
+
+def profile_slugs(options) -> list[str]:
+    return [slugify(p[CONF_PROFILE_NAME]) for p in options.get(CONF_PROFILES, [])]
+
+
+def plan_slugs(options) -> list[str]:
+    return [slugify(p[CONF_PROFILE_NAME]) for p in options.get(CONF_PLANS, [])]
+
+
+def data_source(options) -> tuple[str, str | None]:
+    """API base URL and replay directory (None when fetching over HTTP)."""
+    return (
+        options.get(CONF_API_URL, DEFAULT_API_URL).rstrip("/"),
+        options.get(CONF_REPLAY_DIR) or None,
+    )
+
+
+def day_batches(days: list[str], size: int) -> list[list[str]]:
+    """Sorted ISO days split into runs of consecutive days, at most size each."""
+    batches: list[list[str]] = []
+    for day in days:
+        if (
+            batches
+            and len(batches[-1]) < size
+            and date.fromisoformat(day) - date.fromisoformat(batches[-1][-1]) == timedelta(days=1)
+        ):
+            batches[-1].append(day)
+        else:
+            batches.append([day])
+    return batches
+
+
+def rows_digest(rows: list[dict]) -> str:
+    return hashlib.sha256(json.dumps(rows, sort_keys=True).encode()).hexdigest()
+
+
+class DayFingerprint(NamedTuple):
+    """Content hash of the rows last received for one day."""
+
+    digest: str
+    rows: list[dict]
+
+
+class RangeFingerprint(NamedTuple):
+    """Body hash and HTTP validators of the last today/tomorrow response."""
+
+    url: str
+    digest: str
+    etag: str | None
+    last_modified: str | None
+    days: dict[str, list[dict]]
+
+
+class PSEResponse(NamedTuple):
+    payload: dict | None
+    size: int = 0
+    parse_ms: float = 0.0
+    digest: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    not_modified: bool = False
+
+
 class RCEDataUpdateCoordinator(DataUpdateCoordinator):
     """Central coordinator for RCE integration."""
 
     def __init__(self, hass, entry):
         self.entry = entry
         self.last_successful_update: datetime | None = None
+        self.archive = RCEArchive(hass)
+        self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry.entry_id}")
+        self._day_cache: dict[str, list[dict]] | None = None
+        self._session = async_get_clientsession(hass)
+        self._pending_requests: set[asyncio.Task] = set()
+        self._tomorrow_misses = 0
+        self._error_count = 0
+        self._slot_listeners: list[tuple[CALLBACK_TYPE, bool]] = []
+        self._metrics_listeners: list[CALLBACK_TYPE] = []
+        self._raw_today: list[dict] | None = None
+        self._raw_tomorrow: list[dict] | None = None
+        self.profile_slugs = profile_slugs(entry.options)
+        self.plan_slugs = plan_slugs(entry.options)
+        self.battery_enabled = battery_enabled(entry.options)
+        self.data_source = data_source(entry.options)
+        self._api_url, self._replay_dir = self.data_source
+        self.metrics: dict = {
+            "fetch_latency_ms": {},
+            "bytes_received": 0,
+            "parse_ms": 0.0,
+            "compute_ms": 0.0,
+            "state_writes": 0,
+            "state_writes_skipped": 0,
+            "attributes_bytes": {},
+        }
+        self.last_raw_payload: dict[str, list[dict]] = {}
+        self._fingerprints: dict[str, DayFingerprint] = {}
+        self._range_fingerprint: RangeFingerprint | None = None
+        # bumped on every rebuild; keys the find_cheapest_window LRU
+        self.data_version = 0
+        self._window_cache: OrderedDict[tuple, dict] = OrderedDict()
+        self._data_key: tuple | None = None
+        self._window_index: WindowIndex | None = None
+        # (event type, profile, window) -> cancel callback of its point-in-time timer
+        self._window_timers: dict[tuple[str, str | None, TimedWindow], CALLBACK_TYPE] = {}
+        self._archive_windows: dict[str, list[TimedWindow]] = {}
+        self._forecast_day: str | None = None
+        self._forecast: Forecast | None = None
+        self._unsub_slot_timer: CALLBACK_TYPE | None = None
         super().__init__(
             hass,
             _LOGGER,
             name="RCE Coordinator",
             update_interval=SCAN_INTERVAL,
+            # listeners are only notified when the returned data changes
+            always_update=False,
         )
 
     @property
@@ -49,117 +178,345 @@ class RCEDataUpdateCoordinator(DataUpdateCoordinator):
             model="RCE API v2",
         )
 
-    async def _fetch_day(self, offset: int):
-        date = (dt_util.now() + timedelta(days=offset)).strftime("%Y-%m-%d")
-        try:
-            response = await self.hass.async_add_executor_job(
-                lambda: requests.get(URL.format(day=date), timeout=20)
-            )
-            if response.status_code == 200:
-                return json.loads(response.text).get("value", [])
-        except Exception as err:
-            _LOGGER.warning("PSE API error (%s): %s", date, err)
-        return []
+    # ------------------------------------------------------------
+    # SLOT TICKS
+    # ------------------------------------------------------------
+
+    @callback
+    def async_add_slot_listener(
+        self, update_callback: CALLBACK_TYPE, quarter_hour: bool = False
+    ) -> CALLBACK_TYPE:
+        """Call update_callback at every price slot boundary, without refetching.
+
+        quarter_hour listeners read data that is always in 15-minute slots
+        (energy plans, battery) and are called every 15 minutes even at 1h
+        resolution.
+        """
+        listener = (update_callback, quarter_hour)
+        self._slot_listeners.append(listener)
+        if self._unsub_slot_timer is None:
+            self._start_slot_timer()
+
+        @callback
+        def remove_listener() -> None:
+            self._slot_listeners.remove(listener)
+            if not self._slot_listeners:
+                self._stop_slot_timer()
+
+        return remove_listener
+
+    def _start_slot_timer(self) -> None:
+        # zawsze co kwadrans; w trybie 1h encje godzinowe są pomijane w _handle_slot_tick
+        self._unsub_slot_timer = async_track_time_change(
+            self.hass, self._handle_slot_tick, minute=(0, 15, 30, 45), second=0
+        )
+
+    def _stop_slot_timer(self) -> None:
+        if self._unsub_slot_timer is not None:
+            self._unsub_slot_timer()
+            self._unsub_slot_timer = None
+
+    @callback
+    def _handle_slot_tick(self, now) -> None:
+        # horyzont jest zakotwiczony w chwili zmiany danych, a nie w bieżącym
+        # slocie: wybrane sloty nie przesuwają się w trakcie trwania okna
+        hourly = (
+            self.entry.options.get(CONF_TIME_RESOLUTION, DEFAULT_TIME_RESOLUTION)
+            != RESOLUTION_15M
+        )
+        for update_callback, quarter_hour in list(self._slot_listeners):
+            if quarter_hour or not hourly or now.minute == 0:
+                update_callback()
+
+    # ------------------------------------------------------------
+    # METRICS
+    # ------------------------------------------------------------
+
+    @callback
+    def async_add_metrics_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Call update_callback after every refresh, even when data is unchanged."""
+        self._metrics_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._metrics_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _notify_metrics_listeners(self) -> None:
+        for update_callback in list(self._metrics_listeners):
+            update_callback()
 
     # ------------------------------------------------------------
-    # MASK LOGIC
+    # DAY CACHE
     # ------------------------------------------------------------
 
-    def _apply_min_window(self, mask: list[bool], min_len: int) -> list[bool]:
-        result = mask[:]
-        start = None
+    async def _async_load_cache(self) -> dict[str, list[dict]]:
+        """Load published days from disk once per coordinator lifetime."""
+        if self._day_cache is None:
+            stored = await self._store.async_load() or {}
+            self._day_cache = stored.get("days", {})
+        return self._day_cache
+
+    def _cache_day(self, day: str, rows: list[dict]) -> None:
+        """Remember a complete business day and drop days already in the past."""
+        today = dt_util.now().strftime("%Y-%m-%d")
+        self._day_cache[day] = rows
+        for key in [k for k in self._day_cache if k < today]:
+            self._day_cache.pop(key)
+        self._store.async_delay_save(
+            lambda: {"days": self._day_cache}, CACHE_SAVE_DELAY
+        )
+
+    def _is_day_cached(self, offset: int) -> bool:
+        day = (dt_util.now() + timedelta(days=offset)).strftime("%Y-%m-%d")
+        return self._day_cache is not None and day in self._day_cache
+
+    async def _fetch_days(self, *offsets: int) -> list[list[dict]]:
+        """Rows for each day offset.
+
+        Cached days are served from disk; all the others come from a single
+        range request. Replayed days bypass the disk cache and the archive.
+        """
+        now = dt_util.now()
+        today = now.strftime("%Y-%m-%d")
+        days = [(now + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in offsets]
+
+        for day in [d for d in self._fingerprints if d < today]:
+            del self._fingerprints[day]
 
-        for i, val in enumerate(mask + [False]):
-            if val and start is None:
-                start = i
-            elif not val and start is not None:
-                if i - start < min_len:
-                    for j in range(start, min(i, len(result))):
-                        result[j] = False
-                start = None
+        cache = {} if self._replay_dir else await self._async_load_cache()
+        missing = [day for day in days if day not in cache]
+        fetched: dict[str, list[dict]] = {}
 
+        if missing:
+            started = time.perf_counter()
+            fetched = await self._async_fetch_range(
+                missing[0], missing[-1], self.metrics, remember=True
+            )
+            label = missing[0] if len(missing) == 1 else f"{missing[0]}/{missing[-1]}"
+            self.metrics["fetch_latency_ms"][label] = round(
+                (time.perf_counter() - started) * 1000, 1
+            )
+
+        result = []
+        for day in days:
+            if day in cache:
+                rows = cache[day]
+            else:
+                rows = fetched.get(day, [])
+                self.last_raw_payload[day] = rows
+                # a published day is immutable, a partial one must be refetched
+                if len(rows) in DAY_SLOT_COUNTS and not self._replay_dir:
+                    self._cache_day(day, rows)
+                    await self.archive.async_store_day(day, rows)
+
+            fingerprint = self._fingerprints.get(day)
+            if fingerprint is None or fingerprint.rows is not rows:
+                self._fingerprints[day] = DayFingerprint(rows_digest(rows), rows)
+            result.append(rows)
+
+        while len(self.last_raw_payload) > 2:
+            self.last_raw_payload.pop(min(self.last_raw_payload))
         return result
 
-    def _calculate_mask(
+    async def _async_fetch_range(
         self,
-        prices: list[float],
-        price_mode: str,
-        options: dict,
-        res: str,
-        peak_range: str,
-    ) -> list[bool]:
+        start: str,
+        end: str,
+        metrics: dict | None = None,
+        remember: bool = False,
+    ) -> dict[str, list[dict]]:
+        """Download business days start..end (inclusive) split by business_date.
+
+        Pages are followed through @odata.nextLink. On any API problem the
+        days received so far are returned, so a failed day is simply missing.
+        Received bytes and JSON parse time are added to metrics when given.
+        With remember a single-page response is fingerprinted, so the next
+        identical request is conditional and an unchanged body is neither
+        parsed nor split again.
+
+        With a replay directory configured the recorded days are served
+        instead, re-dated so that the recording starts today.
+        """
+        if self._replay_dir:
+            return await self.hass.async_add_executor_job(
+                read_replay_range,
+                self._replay_dir,
+                dt_util.now().strftime("%Y-%m-%d"),
+                start,
+                end,
+            )
+
+        days_in_range = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+        url = URL.format(
+            base=self._api_url, start=start, end=end, top=days_in_range * MAX_DAY_SLOTS
+        )
+        known = self._range_fingerprint if remember else None
+        if known is not None and known.url != url:
+            known = None
+
+        days: dict[str, list[dict]] = {}
+        first_page = True
+
+        while url:
+            try:
+                response = await self._async_request(url, known if first_page else None)
+            except asyncio.CancelledError:
+                raise
+            except (aiohttp.ClientError, TimeoutError, ValueError) as err:
+                _LOGGER.warning("PSE API error (%s - %s): %s", start, end, err)
+                break
+
+            if metrics is not None:
+                metrics["bytes_received"] += response.size
+                metrics["parse_ms"] = round(metrics["parse_ms"] + response.parse_ms, 2)
+
+            if response.not_modified and known is not None:
+                return known.days
+
+            if response.payload is None:
+                break
+
+            for row in response.payload.get("value", []):
+                day = row.pop("business_date", None) or start
+                days.setdefault(day, []).append(row)
+
+            next_url = response.payload.get("@odata.nextLink")
+            if first_page and remember and not next_url:
+                self._range_fingerprint = RangeFingerprint(
+                    url, response.digest, response.etag, response.last_modified, days
+                )
+            url = next_url
+            first_page = False
+
+        return days
 
-        if not prices:
-            return []
+    # ------------------------------------------------------------
+    # ARCHIVE
+    # ------------------------------------------------------------
 
-        factor = 4
-        full_mask = [False] * len(prices)
+    async def async_backfill(self, start, end) -> dict:
+        """Download archive days missing between start and end.
+
+        Each batch is one range request over consecutive missing days, so
+        already archived days are never downloaded again; batches are
+        throttled.
+        """
+        missing = await self.archive.async_missing_days(start, end)
+        stored: list[str] = []
+        failed: list[str] = []
+
+        # jedno zapytanie o zakres na paczkę, z przerwą między paczkami
+        for i, batch in enumerate(day_batches(missing, BACKFILL_BATCH_SIZE)):
+            if i:
+                await asyncio.sleep(BACKFILL_BATCH_DELAY)
+
+            fetched = await self._async_fetch_range(batch[0], batch[-1])
+            for day in batch:
+                rows = fetched.get(day, [])
+                if len(rows) in DAY_SLOT_COUNTS:
+                    await self.archive.async_store_day(day, rows)
+                    stored.append(day)
+                else:
+                    failed.append(day)
 
-        include_negative = options.get("negative_prices", False)
+        _LOGGER.debug(
+            "RCE backfill %s - %s: %s stored, %s failed",
+            start, end, len(stored), len(failed),
+        )
+        return {"missing": len(missing), "stored": stored, "failed": failed}
 
-        if price_mode == "ALWAYS ON":
-            return [True] * len(prices)
+    # ------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------
 
-        try:
-            start_h, end_h = map(int, peak_range.split("-"))
-            start_idx = max(0, start_h * factor)
-            end_idx = min(len(prices), end_h * factor)
-        except Exception:
-            start_idx, end_idx = 0, len(prices)
-
-        filtered = prices[start_idx:end_idx]
-        temp_mask = [False] * len(filtered)
-
-        if not filtered:
-            return full_mask
-
-        # ---- LOW PRICE CUTOFF ----
-        if price_mode == "LOW PRICE CUTOFF":
-            active_mode = options.get(CONF_OPERATION_MODE, "comfort").lower()
-            percentile = options.get(f"{active_mode}_percentile", 30) / 100.0
-            min_window = options.get(f"{active_mode}_min_window", 2) * factor
-
-            threshold = sorted(filtered)[int(len(filtered) * percentile)]
-            raw_mask = [p <= threshold for p in filtered]
-            temp_mask = self._apply_min_window(raw_mask, min_window)
-
-        # ---- CHEAPEST CONSECUTIVE ----
-        elif price_mode == "CHEAPEST CONSECUTIVE RANGES":
-            count = options.get("consecutive_ranges_count", 4)
-            count *= 4 if res != RESOLUTION_15M else 1
-
-            if len(filtered) >= count:
-                min_sum = float("inf")
-                best_start = 0
-                for i in range(len(filtered) - count + 1):
-                    s = sum(filtered[i : i + count])
-                    if s < min_sum:
-                        min_sum = s
-                        best_start = i
-                for i in range(best_start, best_start + count):
-                    temp_mask[i] = True
-
-        # ---- CHEAPEST NOT CONSECUTIVE ----
-        elif "NOT CONSECUTIVE" in price_mode:
-            count = options.get("cheapest_not_consecutive_count", 4)
-            count *= 4 if res != RESOLUTION_15M else 1
-
-            indexed = sorted(enumerate(filtered), key=lambda x: x[1])
-            for i in range(min(count, len(filtered))):
-                temp_mask[indexed[i][0]] = True
-
-        # ---- NEGATIVE PRICES ----
-        if include_negative:
-            for i, price in enumerate(filtered):
-                if price < 0:
-                    temp_mask[i] = True
-
-        # MAPPING TO FULL MASK
-        for i, val in enumerate(temp_mask):
-            if start_idx + i < len(full_mask):
-                full_mask[start_idx + i] = val
-
-        return full_mask
+    async def _async_get_json(
+        self, url: str, known: RangeFingerprint | None = None
+    ) -> PSEResponse:
+        """Payload with body size, JSON parse time in ms and validators.
+
+        Given the fingerprint of the previous response the request is
+        conditional; a 304 or a body with the same hash is reported as
+        not_modified without parsing it.
+        """
+        headers = {}
+        if known is not None:
+            if known.etag:
+                headers["If-None-Match"] = known.etag
+            if known.last_modified:
+                headers["If-Modified-Since"] = known.last_modified
+
+        async with self._session.get(
+            url, headers=headers, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        ) as response:
+            if response.status == 304 and known is not None:
+                return PSEResponse(None, not_modified=True)
+            if response.status != 200:
+                return PSEResponse(None)
+            body = await response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        digest = hashlib.sha256(body).hexdigest()
+        if known is not None and digest == known.digest:
+            return PSEResponse(None, len(body), 0.0, digest, etag, last_modified, True)
+
+        started = time.perf_counter()
+        payload = json.loads(body)
+        parse_ms = (time.perf_counter() - started) * 1000
+        return PSEResponse(payload, len(body), parse_ms, digest, etag, last_modified)
+
+    async def _async_request(
+        self, url: str, known: RangeFingerprint | None = None
+    ) -> PSEResponse:
+        """Run a request as a tracked task so unloading the entry can cancel it."""
+        task = asyncio.ensure_future(self._async_get_json(url, known))
+        self._pending_requests.add(task)
+        task.add_done_callback(self._pending_requests.discard)
+        return await task
+
+    async def async_shutdown(self) -> None:
+        """Cancel in-flight PSE requests when the entry is unloaded."""
+        for task in list(self._pending_requests):
+            task.cancel()
+        self._stop_slot_timer()
+        for cancel in self._window_timers.values():
+            cancel()
+        self._window_timers.clear()
+        await super().async_shutdown()
+
+    # ------------------------------------------------------------
+    # POLLING SCHEDULE
+    # ------------------------------------------------------------
+
+    def _next_poll_interval(self, now) -> timedelta:
+        """Pick the next refresh based on which days are already complete."""
+        rollover = dt_util.start_of_local_day(now + timedelta(days=1)) - now + ROLLOVER_DELAY
+
+        if not self._is_day_cached(0):
+            return SCAN_INTERVAL
+
+        if self._is_day_cached(1):
+            # nothing left to download until the day rolls over
+            self._tomorrow_misses = 0
+            return rollover
+
+        publication = now.replace(
+            hour=TOMORROW_PUBLICATION_HOUR, minute=0, second=0, microsecond=0
+        )
+        if now < publication:
+            self._tomorrow_misses = 0
+            return publication - now
+
+        interval = PUBLICATION_POLL_INTERVAL * 2 ** self._tomorrow_misses
+        self._tomorrow_misses += 1
+        return min(interval, MAX_PUBLICATION_POLL_INTERVAL, rollover)
+
+    def _retry_interval(self) -> timedelta:
+        self._error_count += 1
+        return min(RETRY_INTERVAL * 2 ** (self._error_count - 1), MAX_RETRY_INTERVAL)
 
     # ------------------------------------------------------------
     # MAIN UPDATE
@@ -167,187 +524,435 @@ class RCEDataUpdateCoordinator(DataUpdateCoordinator):
     
     async def _async_update_data(self):
         try:
-            opt = self.entry.options
-
-            res = opt.get(CONF_TIME_RESOLUTION, DEFAULT_TIME_RESOLUTION)
-            price_mode = opt.get(CONF_PRICE_MODE, DEFAULT_PRICE_MODE)
-            operation_mode = opt.get(CONF_OPERATION_MODE, DEFAULT_OPERATION_MODE)
-            peak_range = opt.get(CONF_CUSTOM_PEAK_HOURS_RANGE, "00-24")
-            negative_prices = opt.get("negative_prices", False)
-
             now = dt_util.now()
 
+            self.metrics.update(fetch_latency_ms={}, bytes_received=0, parse_ms=0.0)
+
             if now.hour == 0:
                 if self.data:
                     self.data["prices_tomorrow"] = []
                     self.data["cheap_mask_tomorrow"] = []
 
             # -----------------------
-            # TODAY (required)
+            # TODAY (required) + TOMORROW (optional), one request
             # -----------------------
-            raw_today = await self._fetch_day(0)
+            raw_tomorrow: list[dict] | None = None
+
+            if now.hour >= TOMORROW_PUBLICATION_HOUR:
+                raw_today, raw_tomorrow = await self._fetch_days(0, 1)
+            else:
+                (raw_today,) = await self._fetch_days(0)
+
             if not raw_today:
                 raise UpdateFailed("No today data from PSE")
 
-            prices_today = [float(x["rce_pln"]) for x in raw_today]
+            self._raw_today = raw_today
+            self._raw_tomorrow = raw_tomorrow
 
             # -----------------------
-            # TOMORROW (optional)
+            # PROVISIONAL TOMORROW (archive only, no API calls)
             # -----------------------
-            prices_tomorrow: list[float] | None = None
-  
-            if now.hour >= 13:
-                raw_tomorrow = await self._fetch_day(1)
-                if raw_tomorrow:
-                    prices_tomorrow = [float(x["rce_pln"]) for x in raw_tomorrow]
-                else:
-                    prices_tomorrow = []
+            if not raw_tomorrow:
+                await self._async_update_forecast(now)
 
             # -----------------------
-            # AGGREGATION 1H
-            # -----------------------
-            if res != RESOLUTION_15M and len(prices_today) == 96:
-                prices_today = [
-                    round(mean(prices_today[i:i + 4]), 2)
-                    for i in range(0, 96, 4)
-                    for _ in range(4)
-                ]
-
-            if (
-                prices_tomorrow is not None
-                and len(prices_tomorrow) == 96
-                and res != RESOLUTION_15M
-            ):
-                prices_tomorrow = [
-                    round(mean(prices_tomorrow[i:i + 4]), 2)
-                    for i in range(0, 96, 4)
-                    for _ in range(4)
-                ]
-
+            # SKIP UNCHANGED
             # -----------------------
-            # MASKS
-            # -----------------------
-            cheap_mask_today = self._calculate_mask(
-                prices_today, price_mode, opt, res, peak_range
-            )
-
-            cheap_mask_tomorrow = (
-                self._calculate_mask(prices_tomorrow, price_mode, opt, res, peak_range)
-                if prices_tomorrow
-                else []
+            key = self._refresh_key(now, raw_today, raw_tomorrow)
+            unchanged = (
+                key is not None
+                and key == self._data_key
+                and self.data
+                and self.data.get("api_status") == "ok"
             )
+            if unchanged:
+                # ten sam obiekt: always_update=False nie powiadomi encji
+                data = self.data
+                self.metrics["compute_ms"] = 0.0
+            else:
+                data = self._build_data(raw_today, raw_tomorrow)
+                self._data_key = key
 
             # -----------------------
-            # WINDOWS ANALYSIS
-            # -----------------------
-            windows_today = self._build_windows_data(prices_today, cheap_mask_today)
-            windows_today_sorted = sorted(windows_today, key=lambda x: x["avg"])
-            best_window_today = windows_today_sorted[0] if windows_today_sorted else None
-            top_windows_today = windows_today_sorted[:3]
-
-            # -----------------------
-            # WINDOWS TOMORROW
+            # SUCCESS
             # -----------------------
-            best_window_tomorrow = None
-            top_windows_tomorrow = []
+            self.last_successful_update = now
+            self._error_count = 0
+            self.update_interval = self._next_poll_interval(now)
 
-            if prices_tomorrow:
-                windows = self._build_windows_data(prices_tomorrow, cheap_mask_tomorrow)
-                if windows:
-                    # BEST
-                    best_window_tomorrow = min(windows, key=lambda x: x["avg"])
-                    # TOP3
-                    top_windows_tomorrow = sorted(windows, key=lambda x: x["avg"])[:3]
+            # metryki i status zmieniają się przy każdym odświeżeniu
+            if unchanged:
+                self._notify_metrics_listeners()
 
+            return data
 
-            # -----------------------
-            # SUCCESS
-            # -----------------------
-            self.last_successful_update = now
-            low_prices = [p for p, mask in zip(prices_today, cheap_mask_today) if mask]
-            max_low_price = max(low_prices) if low_prices else 0.0                     
-
-            return {
-                "api_status": "ok",
-                "last_successful_update": now.isoformat(),
-                "price_mode": price_mode,
-                "operation_mode": operation_mode,
-                "peak_range": peak_range,
-                "prices_today": prices_today,
-                "cheap_mask_today": cheap_mask_today,
-                "windows_today": windows_today,
-                "best_window_today": best_window_today,
-                "top_windows_today": top_windows_today,
-                "prices_tomorrow": prices_tomorrow or [],
-                "cheap_mask_tomorrow": cheap_mask_tomorrow,
-                "best_window_tomorrow": best_window_tomorrow,
-                "top_windows_tomorrow": top_windows_tomorrow,
-                "resolution": res,
-                "stats": {
-                    "average": round(mean(prices_today), 2),
-                    "min": min(prices_today),
-                    "max": max(prices_today),
-                    "median": round(median(prices_today), 2),
-                    "max_low_price": max_low_price,
-                },
-            }
- 
         except Exception as err:
             if self.data is None:
                 self.data = {}
 
             self.data["api_status"] = "error"
+            self.update_interval = self._retry_interval()
+            self._notify_metrics_listeners()
 
             raise UpdateFailed(f"RCE API error: {err}") from err
 
+    def _refresh_key(
+        self, now, raw_today: list[dict], raw_tomorrow: list[dict] | None
+    ) -> tuple | None:
+        """Everything _build_data depends on, None when rows have no fingerprint."""
+        days = [(now.strftime("%Y-%m-%d"), raw_today)]
+        if raw_tomorrow is not None:
+            days.append(((now + timedelta(days=1)).strftime("%Y-%m-%d"), raw_tomorrow))
+
+        digests = []
+        for day, rows in days:
+            fingerprint = self._fingerprints.get(day)
+            if fingerprint is None or fingerprint.rows is not rows:
+                return None
+            digests.append((day, fingerprint.digest))
+
+        options = self.entry.options
+        forecast = None
+        if raw_tomorrow is None and self._forecast is not None:
+            forecast = (self._forecast.day, self._forecast.days_used)
+
+        return (
+            *digests,
+            json.dumps(dict(options), sort_keys=True, default=str),
+            forecast,
+        )
 
-    def _extract_windows(self, mask: list[bool]):
-        """Extract continuous True segments from mask."""
-        if not mask:
-            return []
-
-        windows = []
-        start = None
+    async def _async_update_forecast(self, now) -> None:
+        """Forecast tomorrow from archived days, once per day."""
+        tomorrow = (now + timedelta(days=1)).date()
+        if self._forecast_day == tomorrow.isoformat():
+            return
 
-        for i, val in enumerate(mask + [False]):  # sentinel False na końcu
-            if val and start is None:
-                start = i
-            elif not val and start is not None:
-                windows.append((start, i))
-                start = None
+        try:
+            history = await self.archive.async_get_days(
+                tomorrow - timedelta(days=FORECAST_HISTORY_DAYS), tomorrow - timedelta(days=1)
+            )
+        except sqlite3.Error as err:
+            _LOGGER.warning("RCE archive read failed, no tomorrow forecast: %s", err)
+            return
+
+        # liczba slotów w dniu (92 / 100 przy zmianie czasu)
+        start = dt_util.start_of_local_day(tomorrow)
+        end = dt_util.start_of_local_day(tomorrow + timedelta(days=1))
+        slots = round((end.timestamp() - start.timestamp()) / 900)
+
+        self._forecast = forecast_day(history, tomorrow, slots)
+        self._forecast_day = tomorrow.isoformat()
+        _LOGGER.debug(
+            "RCE forecast for %s: %s",
+            self._forecast_day,
+            f"{self._forecast.days_used} days" if self._forecast else "not enough history",
+        )
 
-        return windows
+    @callback
+    def async_recompute(self) -> bool:
+        """Rebuild masks and windows from held prices after an options change.
 
+        Returns False when nothing has been fetched yet and a full refresh is needed.
+        """
+        if self._raw_today is None:
+            return False
 
-    def _build_windows_data(self, prices: list[float], mask: list[bool]):
-        """Build window statistics based on mask."""
-        if not prices or not mask:
-            return []
+        # bez async_set_updated_data, żeby nie przesuwać zaplanowanego odświeżenia
+        self.data = self._build_data(self._raw_today, self._raw_tomorrow)
+        self._data_key = self._refresh_key(
+            dt_util.now(), self._raw_today, self._raw_tomorrow
+        )
+        self.async_update_listeners()
+        return True
+
+    def _build_data(
+        self, raw_today: list[dict], raw_tomorrow: list[dict] | None
+    ) -> dict:
+        """Turn raw PSE rows into prices, masks, windows and stats."""
+        now = dt_util.now()
+        started = time.perf_counter()
+
+        prices_today = price_array(float(x["rce_pln"]) for x in raw_today)
+
+        prices_tomorrow = None
+        if raw_tomorrow is not None:
+            prices_tomorrow = price_array(float(x["rce_pln"]) for x in raw_tomorrow)
+
+        forecast = self._forecast
+        if forecast is not None and forecast.day != (now + timedelta(days=1)).strftime("%Y-%m-%d"):
+            forecast = None
+
+        data = build_data(
+            prices_today,
+            prices_tomorrow,
+            self.entry.options,
+            now,
+            dt_util.as_utc(dt_util.start_of_local_day(now)),
+            slugify,
+            forecast.prices if forecast is not None else None,
+        )
 
-        if len(prices) != len(mask):
-            _LOGGER.warning(
-                "Prices and mask length mismatch (%s vs %s)",
-                len(prices),
-                len(mask),
-            )
-            return []
+        self.metrics["compute_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.data_version += 1
+        self._window_cache.clear()
+        # indeks kalendarza budowany leniwie przy pierwszym zapytaniu
+        self._window_index = None
+        self._archive_windows.clear()
+        self._schedule_window_events(data)
+        return data
 
-        windows = self._extract_windows(mask)
-        result = []
+    # ------------------------------------------------------------
+    # WINDOW EVENTS
+    # ------------------------------------------------------------
 
-        for start, end in windows:
-            segment = prices[start:end]
+    @staticmethod
+    def _source_windows(source: dict, day_start, tomorrow_start) -> list[TimedWindow]:
+        windows = timed_windows(source.get("windows_today", ()), day_start)
+        if (tomorrow := source.get("analysis_tomorrow")) is not None:
+            windows += timed_windows(tomorrow.windows, tomorrow_start)
+        return windows
 
-            if not segment:
+    def _schedule_window_events(self, data: dict) -> None:
+        """Point-in-time timers for every future window start and end.
+
+        Only the difference to the scheduled set is applied: timers of
+        windows that disappeared or changed are cancelled, new ones are
+        added and unchanged ones keep running. A timer that is already due
+        is never cancelled, so a rebuild on the window boundary itself
+        (e.g. the slot or midnight refresh) cannot swallow its event.
+        """
+        now = dt_util.utcnow()
+        day_start = data["day_start"]
+        tomorrow_start = day_start + SLOT * len(data["prices_today"])
+
+        sources = [(None, data)] + [
+            (profile["name"], profile) for profile in data.get("profiles", {}).values()
+        ]
+        wanted = {}
+        for name, source in sources:
+            for window in merge_adjacent(self._source_windows(source, day_start, tomorrow_start)):
+                if window.start > now:
+                    wanted[(EVENT_WINDOW_STARTED, name, window)] = window.start
+                if window.end > now:
+                    wanted[(EVENT_WINDOW_ENDED, name, window)] = window.end
+
+        for key in self._window_timers.keys() - wanted.keys():
+            event_type, _, window = key
+            when = window.start if event_type == EVENT_WINDOW_STARTED else window.end
+            if when <= now:
+                # termin już minął, timer zaraz się wykona
                 continue
+            self._window_timers.pop(key)()
+        for key in wanted.keys() - self._window_timers.keys():
+            self._window_timers[key] = async_track_point_in_utc_time(
+                self.hass, partial(self._fire_window_event, key), wanted[key]
+            )
 
-            result.append({
-                "start": start,
-                "end": end,
-                "avg": round(mean(segment), 2),
-                "min": min(segment),
-                "max": max(segment),
-                "length": end - start,   # 👈 NOWE (przyda się do rankingów)
-            })
+    @callback
+    def _fire_window_event(self, key: tuple[str, str | None, TimedWindow], _now) -> None:
+        self._window_timers.pop(key, None)
+        event_type, profile, window = key
+        self.hass.bus.async_fire(
+            event_type,
+            {
+                "profile": profile,
+                "start": dt_util.as_local(window.start).isoformat(),
+                "end": dt_util.as_local(window.end).isoformat(),
+                "avg_price": window.avg,
+                "min_price": window.min,
+                "max_price": window.max,
+                "duration_minutes": int((window.end - window.start).total_seconds() // 60),
+            },
+        )
 
-        return result
+    def window_index(self) -> WindowIndex:
+        """Cheap windows of today and tomorrow as instants, built once per data change."""
+        if self._window_index is None:
+            data = self.data or {}
+            day_start = data.get("day_start")
+            windows: list[TimedWindow] = []
+            if day_start is not None:
+                tomorrow_start = day_start + SLOT * len(data.get("prices_today", ()))
+                windows = self._source_windows(data, day_start, tomorrow_start)
+            self._window_index = WindowIndex(windows)
+        return self._window_index
+
+    async def async_archived_windows(self, start: date, end: date) -> list[TimedWindow]:
+        """Cheap windows of archived days start..end (inclusive), in time order.
+
+        Windows are computed with the current options once per day and data
+        change, so calendar polls over the same range only read the cache.
+        """
+        days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        found = {day: self._archive_windows[day] for day in days if day in self._archive_windows}
+        missing = [day for day in days if day not in found]
+
+        if missing:
+            version = self.data_version
+            try:
+                stored = await self.archive.async_get_days(
+                    date.fromisoformat(missing[0]), date.fromisoformat(missing[-1])
+                )
+            except sqlite3.Error as err:
+                _LOGGER.warning("RCE archive read failed: %s", err)
+                stored = {}
+
+            computed = {
+                day: timed_windows(
+                    day_windows(stored[day], self.entry.options),
+                    dt_util.as_utc(dt_util.start_of_local_day(date.fromisoformat(day))),
+                )
+                if day in stored
+                else []
+                for day in missing
+            }
+            found.update(computed)
+
+            # opcje mogły zmienić się w trakcie odczytu; wtedy bez zapisu do cache
+            if version == self.data_version:
+                if len(self._archive_windows) + len(computed) > CALENDAR_ARCHIVE_CACHE_DAYS:
+                    self._archive_windows.clear()
+                self._archive_windows.update(computed)
+
+        return [w for day in days for w in found[day]]
+
+    @callback
+    def record_state_write(self, entity_id: str, size: int) -> None:
+        """Count entity state writes and remember their serialized size."""
+        self.metrics["state_writes"] += 1
+        self.metrics["attributes_bytes"][entity_id] = size
+
+    @callback
+    def record_skipped_write(self) -> None:
+        """Count updates that left an entity's state and attributes unchanged."""
+        self.metrics["state_writes_skipped"] += 1
+
+    async def async_optimize_battery(
+        self, soc: float | None = None, deadline=None, **overrides
+    ) -> dict:
+        """Battery schedule from the current slot for the rce.optimize_battery service.
+
+        soc is the current state of charge in percent (default: minimum),
+        overrides replace optimize_battery settings from the options.
+        """
+        data = self.data or {}
+        prices = data.get("prices_horizon")
+        series_start = data.get("horizon_start")
+        if not prices or series_start is None:
+            raise ValueError("No prices available")
+
+        settings = {**battery_settings(self.entry.options), **overrides}
+        if settings["capacity_kwh"] <= 0:
+            raise ValueError("Battery capacity is not configured")
+
+        start = max((dt_util.utcnow() - series_start) // SLOT_DURATION, 0)
+        end = len(prices)
+        if deadline is not None:
+            end = min(end, (deadline - series_start) // SLOT_DURATION)
+        if end <= start:
+            raise ValueError("No price slots before the deadline")
+
+        result = await self.hass.async_add_executor_job(
+            partial(
+                optimize_battery,
+                prices[start:end],
+                initial_soc=soc / 100 if soc is not None else None,
+                **settings,
+            )
+        )
+
+        def at(index: int) -> str:
+            return dt_util.as_local(series_start + SLOT_DURATION * (start + index)).isoformat()
+
+        return {
+            "initial_soc": result["initial_soc"],
+            "profit": result["profit"],
+            "charged_kwh": result["charged_kwh"],
+            "discharged_kwh": result["discharged_kwh"],
+            "schedule": [
+                {
+                    "start": at(first),
+                    "end": at(last),
+                    "action": ACTIONS[action],
+                    "soc": result["soc"][last - 1],
+                }
+                for first, last, action in action_runs(result["actions"])
+            ],
+        }
+
+    def find_cheapest_window(
+        self,
+        slots: int,
+        earliest_start=None,
+        deadline=None,
+        energy_profile: list[float] | None = None,
+    ) -> dict:
+        """Cheapest block of consecutive slots for the rce.find_cheapest_window service.
+
+        Searches the held horizon prices (now -> end of tomorrow); the block
+        starts no earlier than earliest_start (default: the current slot)
+        and ends by deadline. Results are memoized per data version and
+        slot-resolved parameters, so calls within the same slot share one
+        search.
+        """
+        data = self.data or {}
+        prices = data.get("prices_horizon")
+        series_start = data.get("horizon_start")
+        if not prices or series_start is None:
+            return {"found": False}
+
+        start = (dt_util.utcnow() - series_start) // SLOT_DURATION
+        if earliest_start is not None:
+            start = max(start, -(-(earliest_start - series_start) // SLOT_DURATION))
+        end = len(prices)
+        if deadline is not None:
+            end = min(end, (deadline - series_start) // SLOT_DURATION)
+
+        key = (self.data_version, slots, start, end, tuple(energy_profile or ()))
+        if key in self._window_cache:
+            self._window_cache.move_to_end(key)
+            return dict(self._window_cache[key])
+
+        window = find_window(prices, series_start, slots, start, end, energy_profile)
+        if window is None:
+            result = {"found": False}
+        else:
+            result = {
+                "found": True,
+                **window,
+                "start": dt_util.as_local(window["start"]).isoformat(),
+                "end": dt_util.as_local(window["end"]).isoformat(),
+            }
+
+        self._window_cache[key] = result
+        while len(self._window_cache) > WINDOW_CACHE_SIZE:
+            self._window_cache.popitem(last=False)
+        return dict(result)
+
+    def prices_response(self, profile: str | None = None) -> dict:
+        """Full price and mask arrays for the rce.get_prices service."""
+        data = self.data or {}
+        source = data
+        if profile is not None:
+            source = data.get("profiles", {}).get(slugify(profile))
+            if source is None:
+                raise ValueError(f"Unknown profile: {profile}")
+
+        return {
+            "resolution": data.get("resolution"),
+            "price_mode": source.get("price_mode"),
+            "today": {
+                "prices": as_list(data.get("prices_today", [])),
+                "cheap_mask": as_list(source.get("cheap_mask_today", [])),
+            },
+            "tomorrow": {
+                "prices": as_list(data.get("prices_tomorrow", [])),
+                "cheap_mask": as_list(source.get("cheap_mask_tomorrow", [])),
+            },
+            "tomorrow_forecast": {
+                "provisional": data.get("tomorrow_provisional", False),
+                "prices": as_list(data.get("prices_forecast_tomorrow", [])),
+                "cheap_mask": as_list(data.get("cheap_mask_forecast_tomorrow", [])),
+            },
+        }
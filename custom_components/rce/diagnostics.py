@@ -0,0 +1,46 @@
+"""Diagnostics support for RCE (PSE)."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import ARRAY_ATTRIBUTES, DOMAIN
+from .series import as_list
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Options, refresh metrics, current data summary and last raw PSE payload."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    data = coordinator.data or {}
+
+    def summary(values: dict) -> dict:
+        # indeksy DayAnalysis są pochodną masek, pomijamy je
+        return {
+            key: as_list(value)
+            for key, value in values.items()
+            if key not in ARRAY_ATTRIBUTES and not key.startswith("analysis_")
+        }
+
+    return {
+        "options": dict(entry.options),
+        "update_interval": str(coordinator.update_interval),
+        "last_successful_update": coordinator.last_successful_update,
+        "metrics": coordinator.metrics,
+        "data": {
+            **summary(data),
+            "profiles": {
+                slug: summary(profile)
+                for slug, profile in data.get("profiles", {}).items()
+            },
+            "battery": summary(data["battery"]) if data.get("battery") else None,
+            "plans": {
+                slug: {key: value for key, value in plan.items() if key != "mask"}
+                for slug, plan in data.get("plans", {}).items()
+            },
+        },
+        "last_raw_payload": coordinator.last_raw_payload,
+    }
@@ -1,9 +1,20 @@
+from homeassistant.core import callback
+from homeassistant.helpers.json import json_bytes
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from .const import DOMAIN
+from homeassistant.util import dt as dt_util
+from .const import DOMAIN, SLOT_DURATION
 
 class RCEBaseEntity(CoordinatorEntity):
     _attr_has_entity_name = True
 
+    # encje zależne od bieżącego slotu odświeżają się co kwadrans / godzinę
+    _slot_dependent = False
+    # dane zawsze w slotach 15-min (plany, bateria): odświeżanie co kwadrans także w trybie 1h
+    _quarter_hour = False
+
+    # encje diagnostyczne odświeżają się po każdym pobraniu, także bez zmiany danych
+    _metrics_dependent = False
+
     def __init__(self, coordinator, entry_id: str):
         super().__init__(coordinator)
 
@@ -13,6 +24,74 @@ class RCEBaseEntity(CoordinatorEntity):
         # przydatne dla unique_id w encjach potomnych
         self._entry_id = entry_id
 
+        # skrót ostatnio zapisanego stanu (stan + atrybuty + dostępność)
+        self._last_digest: int | None = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if self._slot_dependent:
+            self.async_on_remove(
+                self.coordinator.async_add_slot_listener(
+                    self._async_write_if_changed, self._quarter_hour
+                )
+            )
+        if self._metrics_dependent:
+            self.async_on_remove(
+                self.coordinator.async_add_metrics_listener(self._async_write_if_changed)
+            )
+
+    def _slot_index(self) -> int:
+        """Slot of now counted from the data's midnight, over today + tomorrow.
+
+        The 00:00 slot tick fires before the rollover refresh; counting from
+        day_start then lands in tomorrow instead of yesterday's first slot.
+        DST days keep their 92 / 100 slots as well.
+        """
+        day_start = (self.coordinator.data or {}).get("day_start")
+        if day_start is None:
+            return 0
+        # tick wypada dokładnie na granicy, która należy już do nowego slotu
+        return (dt_util.utcnow() - day_start) // SLOT_DURATION
+
+    def _day_slot(self) -> tuple[str, int]:
+        """("today" | "tomorrow", index within that day) of the current slot."""
+        index = self._slot_index()
+        today = len((self.coordinator.data or {}).get("prices_today") or ())
+        if today and index >= today:
+            return "tomorrow", index - today
+        return "today", index
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._async_write_if_changed()
+
+    def _state_digest(self) -> int:
+        """Cheap fingerprint of what a state write would store."""
+        if not self.available:
+            return hash((False,))
+        return hash(json_bytes((self.state, self.state_attributes, self.extra_state_attributes)))
+
+    @callback
+    def _async_write_if_changed(self) -> None:
+        """Write state only when it differs from the last coordinator-driven write.
+
+        Covers coordinator updates and slot ticks; other callers of
+        async_write_ha_state (e.g. registry changes) always write.
+        """
+        digest = self._state_digest()
+        if digest == self._last_digest:
+            self.coordinator.record_skipped_write()
+            return
+        self._last_digest = digest
+        self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        super().async_write_ha_state()
+        # metryki diagnostyczne: liczba zapisów i rozmiar zserializowanego stanu
+        if (state := self.hass.states.get(self.entity_id)) is not None:
+            self.coordinator.record_state_write(self.entity_id, len(state.as_dict_json))
+
     @property                                             
     def available(self) -> bool:
         return bool(self.coordinator.data)
@@ -0,0 +1,71 @@
+"""History-based price forecast for the RCE integration.
+
+Builds a provisional series for a day whose prices are not published yet
+from archived days: the per-slot median of the most recent days blended
+with the per-slot median of the same weekday.
+"""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from datetime import date, timedelta
+from statistics import median
+from typing import NamedTuple
+
+from .series import price_array
+
+RECENT_DAYS = 7
+WEEKDAY_WEEKS = 4
+MIN_DAYS = 3
+WEEKDAY_WEIGHT = 0.5
+
+
+class Forecast(NamedTuple):
+    """Provisional prices for one business day."""
+
+    day: str
+    prices: Sequence[float]
+    days_used: int
+
+
+def slot_medians(days: Sequence[Sequence[float]]) -> list[float]:
+    """Median of every slot across days (columns via one transpose)."""
+    return [median(column) for column in zip(*days)]
+
+
+def forecast_day(
+    history: Mapping[str, Sequence[float]], target: date, slots: int = 96
+) -> Forecast | None:
+    """Provisional prices for target from the days before it.
+
+    Only days with the same number of slots are used, so a DST change day
+    is never mixed with regular days. None when fewer than MIN_DAYS recent
+    days are known.
+    """
+    recent = []
+    weekday = []
+    for offset in range(1, WEEKDAY_WEEKS * 7 + 1):
+        day = target - timedelta(days=offset)
+        prices = history.get(day.isoformat())
+        if prices is None or len(prices) != slots:
+            continue
+        if offset <= RECENT_DAYS:
+            recent.append(prices)
+        if offset % 7 == 0:
+            weekday.append(prices)
+
+    if len(recent) < MIN_DAYS:
+        return None
+
+    profile = slot_medians(recent)
+    if weekday:
+        # ten sam dzień tygodnia niesie weekendowy / roboczy kształt dnia
+        same_day = slot_medians(weekday)
+        profile = [
+            (1 - WEEKDAY_WEIGHT) * a + WEEKDAY_WEIGHT * b for a, b in zip(profile, same_day)
+        ]
+
+    return Forecast(
+        target.isoformat(),
+        price_array(round(p, 2) for p in profile),
+        len({id(day) for day in recent + weekday}),
+    )
@@ -0,0 +1,251 @@
+"""Cheap-slot mask algorithms for the RCE integration.
+
+Pure functions over plain price sequences, without any Home Assistant
+imports, so they can be tested and run over series of any length
+(single day, 48 h horizon, multi-month history).
+"""
+from __future__ import annotations
+
+from heapq import nsmallest
+from itertools import accumulate
+from math import fsum
+from typing import Sequence
+
+from .const import (
+    PRICE_MODE_ALWAYS_ON,
+    PRICE_MODE_CHEAPEST_ANY,
+    PRICE_MODE_CHEAPEST_CONSECUTIVE,
+    PRICE_MODE_LOW_PRICE_CUTOFF,
+)
+
+
+# ============================================================
+# SELECTION
+# ============================================================
+def kth_smallest(values: Sequence[float], k: int) -> float:
+    """Return the k-th smallest value (0-based) in expected O(n) time."""
+    items = list(values)
+    while True:
+        pivot = items[len(items) // 2]
+        lows = [v for v in items if v < pivot]
+        if k < len(lows):
+            items = lows
+            continue
+
+        equal = sum(1 for v in items if v == pivot)
+        if k < len(lows) + equal:
+            return pivot
+
+        k -= len(lows) + equal
+        items = [v for v in items if v > pivot]
+
+
+def percentile_threshold(values: Sequence[float], percentile: float) -> float:
+    """Price at the given percentile (0.0 - 1.0), same index rule as sorted()[int(n * p)]."""
+    k = min(int(len(values) * percentile), len(values) - 1)
+    return kth_smallest(values, k)
+
+
+def cheapest_slots(
+    values: Sequence[float],
+    count: int,
+    candidates: Sequence[int] | None = None,
+) -> list[int]:
+    """Indices of the `count` cheapest slots, O(n log count), ties by position."""
+    if candidates is None:
+        candidates = range(len(values))
+    return nsmallest(count, candidates, key=values.__getitem__)
+
+
+def cheapest_consecutive_start(
+    values: Sequence[float],
+    count: int,
+    eligible: Sequence[bool] | None = None,
+) -> int | None:
+    """Start of the cheapest block of `count` consecutive eligible slots, via prefix sums."""
+    if count <= 0 or len(values) < count:
+        return None
+
+    prefix = [0.0, *accumulate(values)]
+    blocked = [0, *accumulate(not e for e in eligible)] if eligible is not None else None
+
+    best_start = None
+    min_sum = float("inf")
+
+    for i in range(len(values) - count + 1):
+        if blocked is not None and blocked[i + count] != blocked[i]:
+            continue
+        s = prefix[i + count] - prefix[i]
+        if s < min_sum:
+            min_sum = s
+            best_start = i
+
+    return best_start
+
+
+def cheapest_block(
+    values: Sequence[float],
+    count: int,
+    start: int = 0,
+    end: int | None = None,
+    weights: Sequence[float] | None = None,
+) -> tuple[int, float] | None:
+    """Cheapest block of `count` consecutive slots inside [start, end).
+
+    Returns (first slot, cost). Cost is the plain sum of prices or, with
+    weights (one per slot of the block), their weighted sum. Ties go to
+    the earliest block.
+    """
+    start = max(start, 0)
+    end = len(values) if end is None else min(end, len(values))
+    if count <= 0 or end - start < count:
+        return None
+
+    if weights is None:
+        prefix = [0.0, *accumulate(values[i] for i in range(start, end))]
+        best = min(range(end - start - count + 1), key=lambda i: prefix[i + count] - prefix[i])
+        return start + best, prefix[best + count] - prefix[best]
+
+    return min(
+        (
+            (i, sum(w * values[i + j] for j, w in enumerate(weights)))
+            for i in range(start, end - count + 1)
+        ),
+        key=lambda item: item[1],
+    )
+
+
+# ============================================================
+# MASK HELPERS
+# ============================================================
+def apply_min_window(mask: Sequence[bool], min_len: int) -> list[bool]:
+    """Drop True runs shorter than min_len in a single pass."""
+    result = list(mask)
+    start = None
+
+    for i, val in enumerate(mask):
+        if val:
+            if start is None:
+                start = i
+        elif start is not None:
+            if i - start < min_len:
+                result[start:i] = [False] * (i - start)
+            start = None
+
+    if start is not None and len(mask) - start < min_len:
+        result[start:] = [False] * (len(mask) - start)
+
+    return result
+
+
+def extract_windows(mask: Sequence[bool]) -> list[tuple[int, int]]:
+    """Continuous True segments of mask as (start, end) pairs, end exclusive."""
+    windows = []
+    start = None
+
+    for i, val in enumerate(mask):
+        if val:
+            if start is None:
+                start = i
+        elif start is not None:
+            windows.append((start, i))
+            start = None
+
+    if start is not None:
+        windows.append((start, len(mask)))
+
+    return windows
+
+
+def build_windows(
+    prices: Sequence[float],
+    mask: Sequence[bool],
+    prefix: Sequence[float] | None = None,
+) -> list[dict]:
+    """Window statistics for every True segment of mask.
+
+    prefix (prefix sums of prices, len + 1) makes each average O(1); without
+    it only the window segments are summed, never the whole series.
+    """
+    result = []
+
+    for start, end in extract_windows(mask):
+        segment = prices[start:end]
+        total = prefix[end] - prefix[start] if prefix is not None else fsum(segment)
+
+        result.append({
+            "start": start,
+            "end": end,
+            "avg": round(total / (end - start), 2),
+            "min": min(segment),
+            "max": max(segment),
+            "length": end - start,
+        })
+
+    return result
+
+
+# ============================================================
+# MASK
+# ============================================================
+def eligible_slots(slot_hours: Sequence[int], start_h: int, end_h: int) -> list[bool]:
+    """Slots whose hour of day falls into the [start_h, end_h) operating range."""
+    return [start_h <= h < end_h for h in slot_hours]
+
+
+def calculate_mask(
+    prices: Sequence[float],
+    price_mode: str,
+    *,
+    eligible: Sequence[bool] | None = None,
+    percentile: float = 0.3,
+    min_window: int = 1,
+    count: int = 4,
+    include_negative: bool = False,
+) -> list[bool]:
+    """Cheap-slot mask for prices, considering only eligible slots.
+
+    The series may be a single day or several days joined together;
+    ineligible slots are never selected and break consecutive blocks.
+    percentile / min_window apply to LOW PRICE CUTOFF, count (in slots)
+    to both CHEAPEST modes.
+    """
+    if not prices:
+        return []
+
+    if price_mode == PRICE_MODE_ALWAYS_ON:
+        return [True] * len(prices)
+
+    if eligible is None:
+        eligible = [True] * len(prices)
+
+    mask = [False] * len(prices)
+    candidates = [i for i, ok in enumerate(eligible) if ok]
+
+    if not candidates:
+        return mask
+
+    # ---- LOW PRICE CUTOFF ----
+    if price_mode == PRICE_MODE_LOW_PRICE_CUTOFF:
+        threshold = percentile_threshold([prices[i] for i in candidates], percentile)
+        raw_mask = [ok and p <= threshold for p, ok in zip(prices, eligible)]
+        mask = apply_min_window(raw_mask, min_window)
+
+    # ---- CHEAPEST CONSECUTIVE ----
+    elif price_mode == PRICE_MODE_CHEAPEST_CONSECUTIVE:
+        best_start = cheapest_consecutive_start(prices, count, eligible)
+        if best_start is not None:
+            mask[best_start:best_start + count] = [True] * count
+
+    # ---- CHEAPEST NOT CONSECUTIVE ----
+    elif price_mode == PRICE_MODE_CHEAPEST_ANY:
+        for i in cheapest_slots(prices, count, candidates):
+            mask[i] = True
+
+    # ---- NEGATIVE PRICES ----
+    if include_negative:
+        for i in candidates:
+            if prices[i] < 0:
+                mask[i] = True
+
+    return mask
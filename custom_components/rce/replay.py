@@ -0,0 +1,71 @@
+"""Recorded PSE payloads for offline replay.
+
+A replay directory holds JSON files with the rows of one business day
+(`YYYY-MM-DD.json`, either a saved PSE response or a bare list of rows)
+and/or RCE diagnostics downloads, whose last_raw_payload is used. No Home
+Assistant imports; the stand-in server in benchmarks/ reads the same
+directories.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from datetime import date, timedelta
+from pathlib import Path
+
+_LOGGER = logging.getLogger(__name__)
+
+DAY_FILE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.json$")
+
+
+def load_recorded_days(directory: str | Path) -> dict[str, list[dict]]:
+    """All recorded days in directory keyed by business date."""
+    days: dict[str, list[dict]] = {}
+
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            content = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Skipping recorded payload %s: %s", path.name, err)
+            continue
+
+        match = DAY_FILE.match(path.name)
+        if match:
+            rows = content.get("value", []) if isinstance(content, dict) else content
+            days[match[1]] = rows
+        elif isinstance(content, dict):
+            # diagnostics download: {"data": {..., "last_raw_payload": {day: rows}}}
+            payload = content.get("data", content).get("last_raw_payload")
+            if isinstance(payload, dict):
+                for day, rows in payload.items():
+                    days.setdefault(day, rows)
+
+    return days
+
+
+def replay_range(
+    recorded: dict[str, list[dict]], today: str, start: str, end: str
+) -> dict[str, list[dict]]:
+    """Recorded days re-dated so the earliest one is served as today.
+
+    The n-th recorded day (in date order) becomes today + n; requested
+    dates outside the recording are simply missing.
+    """
+    ordered = [recorded[day] for day in sorted(recorded)]
+    base = date.fromisoformat(today)
+    first = (date.fromisoformat(start) - base).days
+    last = (date.fromisoformat(end) - base).days
+
+    return {
+        (base + timedelta(days=offset)).isoformat(): [
+            {key: value for key, value in row.items() if key != "business_date"}
+            for row in ordered[offset]
+        ]
+        for offset in range(max(first, 0), min(last, len(ordered) - 1) + 1)
+    }
+
+
+def read_replay_range(directory: str, today: str, start: str, end: str) -> dict[str, list[dict]]:
+    """Blocking helper for the executor: load directory and re-date it."""
+    return replay_range(load_recorded_days(directory), today, start, end)
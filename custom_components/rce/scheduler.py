@@ -0,0 +1,116 @@
+"""Energy plans for the RCE integration.
+
+Optimal slot selection for loads that need a fixed amount of energy by a
+deadline, with a minimum run length and a limit on the number of starts.
+"""
+from __future__ import annotations
+
+from itertools import accumulate
+from typing import Sequence
+
+INF = float("inf")
+
+
+def plan_slots(
+    prices: Sequence[float],
+    count: int,
+    *,
+    min_run: int = 1,
+    max_starts: int = 0,
+    eligible: Sequence[bool] | None = None,
+) -> list[bool] | None:
+    """Cheapest selection of exactly `count` slots, None when infeasible.
+
+    Chosen slots form runs of at least min_run consecutive slots, at most
+    max_starts of them (0 = unlimited); ineligible slots are never chosen.
+
+    Dynamic programme with one layer per slot boundary. A layer holds, for
+    each number of runs started and each on/off state, the best cost for
+    every count of chosen slots as one list, so transitions are whole-list
+    shifts. Starting a run jumps min_run slots ahead at once (prefix
+    sums), which keeps the run length out of the state: O(n * max_starts
+    * count). The plan is rebuilt by walking back through the stored
+    layers and matching costs.
+    """
+    n = len(prices)
+    if count <= 0:
+        return [False] * n
+    if count > n:
+        return None
+
+    run = max(min_run, 1)
+    limit = min(max_starts, count) if max_starts > 0 else 0
+    starts = limit + 1
+    if eligible is None:
+        eligible = [True] * n
+
+    prefix = [0.0, *accumulate(prices)]
+    blocked = [0, *accumulate(not ok for ok in eligible)]
+    empty = [INF] * (count + 1)
+
+    # off[i][s][c] / on[i][s][c]: first i slots decided, s runs started,
+    # c slots chosen, slot i - 1 off / on (runs are always >= min_run)
+    off = [[empty] * starts for _ in range(n + 1)]
+    on = [[empty] * starts for _ in range(n + 1)]
+    off[0][0] = [0.0] + [INF] * count
+
+    for i in range(n):
+        price = prices[i]
+        can_start = i + run <= n and blocked[i + run] == blocked[i]
+        seg = prefix[i + run] - prefix[i] if can_start else 0.0
+
+        for s in range(starts):
+            idle, busy = off[i][s], on[i][s]
+            off[i + 1][s] = [a if a < b else b for a, b in zip(idle, busy)]
+
+            if eligible[i]:
+                extended = [INF, *(x + price for x in busy[:-1])]
+                target = on[i + 1][s]
+                on[i + 1][s] = [a if a < b else b for a, b in zip(target, extended)]
+
+            if can_start and run <= count and (not limit or s < limit):
+                nxt = s + 1 if limit else s
+                started = [INF] * run + [x + seg for x in idle[:count + 1 - run]]
+                target = on[i + run][nxt]
+                on[i + run][nxt] = [a if a < b else b for a, b in zip(target, started)]
+
+    best = min(
+        ((layer[n][s][count], s, state) for s in range(starts) for state, layer in ((0, off), (1, on))),
+        key=lambda item: item[0],
+    )
+    if best[0] == INF:
+        return None
+
+    mask = [False] * n
+    _, s, state = best
+    i, c = n, count
+    while i > 0:
+        if state == 0:
+            value = off[i][s][c]
+            state = 0 if off[i - 1][s][c] == value else 1
+            i -= 1
+        elif eligible[i - 1] and c > 0 and on[i - 1][s][c - 1] + prices[i - 1] == on[i][s][c]:
+            mask[i - 1] = True
+            i, c = i - 1, c - 1
+        else:
+            # the run was started here, min_run slots back
+            mask[i - run:i] = [True] * run
+            i, c, state = i - run, c - run, 0
+            if limit:
+                s -= 1
+    return mask
+
+
+def slot_runs(mask: Sequence[bool], offset: int = 0) -> list[tuple[int, int]]:
+    """(start, end) of each run of True in mask, end exclusive, shifted by offset."""
+    runs = []
+    start = None
+    for i, value in enumerate(mask):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            runs.append((offset + start, offset + i))
+            start = None
+    if start is not None:
+        runs.append((offset + start, offset + len(mask)))
+    return runs
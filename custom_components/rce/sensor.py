@@ -11,14 +11,30 @@ from homeassistant.components.sensor import (
     SensorStateClass,
     SensorEntityDescription,
 )
-from homeassistant.const import EntityCategory
-from homeassistant.util import dt as dt_util
+from homeassistant.const import EntityCategory, UnitOfInformation, UnitOfTime
+from homeassistant.util import dt as dt_util, slugify
 
 from .const import (
+    ARRAY_ATTRIBUTES,
+    CONF_COMPACT_ATTRIBUTES,
+    DEFAULT_COMPACT_ATTRIBUTES,
     DOMAIN,
     DEFAULT_CURRENCY,
     DEFAULT_PRICE_TYPE,
-    RESOLUTION_15M,
+    CONF_PLANS,
+    CONF_PROFILE_NAME,
+    CONF_BATTERY_CAPACITY,
+    DEFAULT_BATTERY_CAPACITY,
+    SLOT_DURATION,
+)
+from .battery import ACTIONS
+from .analysis import (
+    EMPTY_DAY,
+    DayAnalysis,
+    active_cycle,
+    format_range,
+    market_price_attributes,
+    top_windows_attributes,
 )
 from .entity import RCEBaseEntity
 
@@ -75,6 +91,16 @@ SENSORS: tuple[RCESensorDescription, ...] = (
         key="best_window_tomorrow",
         translation_key="best_window_tomorrow",
     ),
+    RCESensorDescription(
+        key="next_cheap_window_horizon",
+        translation_key="next_cheap_window_horizon",
+        device_class=SensorDeviceClass.TIMESTAMP,
+    ),
+    RCESensorDescription(
+        key="best_window_horizon",
+        translation_key="best_window_horizon",
+        device_class=SensorDeviceClass.TIMESTAMP,
+    ),
     RCESensorDescription(
         key="top3_windows_today",
         translation_key="top3_windows_today",
@@ -83,6 +109,16 @@ SENSORS: tuple[RCESensorDescription, ...] = (
         key="top3_windows_tomorrow",
         translation_key="top3_windows_tomorrow",
     ),
+
+    # --- PROVISIONAL TOMORROW (forecast until published) ---
+    RCESensorDescription(
+        key="best_window_tomorrow_provisional",
+        translation_key="best_window_tomorrow_provisional",
+    ),
+    RCESensorDescription(
+        key="top3_windows_tomorrow_provisional",
+        translation_key="top3_windows_tomorrow_provisional",
+    ),
     
     # --- DIAGNOSTICS ---
     RCESensorDescription(
@@ -96,6 +132,58 @@ SENSORS: tuple[RCESensorDescription, ...] = (
         device_class=SensorDeviceClass.TIMESTAMP,
         entity_category=EntityCategory.DIAGNOSTIC,
     ),
+    RCESensorDescription(
+        key="refresh_fetch_time",
+        translation_key="refresh_fetch_time",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    RCESensorDescription(
+        key="refresh_compute_time",
+        translation_key="refresh_compute_time",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    RCESensorDescription(
+        key="payload_size",
+        translation_key="payload_size",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    RCESensorDescription(
+        key="state_writes",
+        translation_key="state_writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+)
+
+BATTERY_SENSORS: tuple[RCESensorDescription, ...] = (
+    RCESensorDescription(
+        key="battery_action",
+        translation_key="battery_action",
+        device_class=SensorDeviceClass.ENUM,
+        options=list(ACTIONS.values()),
+    ),
+    RCESensorDescription(
+        key="battery_profit",
+        translation_key="battery_profit",
+        device_class=SensorDeviceClass.MONETARY,
+        native_unit_of_measurement=DEFAULT_CURRENCY,
+    ),
+)
+
+PLAN_COST = RCESensorDescription(
+    key="plan",
+    translation_key="plan_cost",
+    device_class=SensorDeviceClass.MONETARY,
+    native_unit_of_measurement=DEFAULT_CURRENCY,
 )
 
 # ============================================================
@@ -133,60 +221,54 @@ async def async_setup_entry(hass, entry, async_add_entities):
         elif key == "best_window_tomorrow":
             entities.append(RCEBestWindowTomorrowSensor(coordinator, entry.entry_id, description))
 
+        elif key == "next_cheap_window_horizon":
+            entities.append(RCENextCheapWindowHorizonSensor(coordinator, entry.entry_id, description))
+
+        elif key == "best_window_horizon":
+            entities.append(RCEBestWindowHorizonSensor(coordinator, entry.entry_id, description))
+
         elif key == "top3_windows_today":
             entities.append(RCETop3WindowsTodaySensor(coordinator, entry.entry_id, description))
 
         elif key == "top3_windows_tomorrow":
             entities.append(RCETop3WindowsTomorrowSensor(coordinator, entry.entry_id, description))
 
+        elif key == "best_window_tomorrow_provisional":
+            entities.append(RCEBestWindowProvisionalSensor(coordinator, entry.entry_id, description))
+
+        elif key == "top3_windows_tomorrow_provisional":
+            entities.append(RCETop3WindowsProvisionalSensor(coordinator, entry.entry_id, description))
+
         elif key == "api_status":
             entities.append(RCEApiStatusSensor(coordinator, entry.entry_id, description))
 
         elif key == "last_successful_update":
             entities.append(RCELastSuccessfulUpdateSensor(coordinator, entry.entry_id, description))
 
-    async_add_entities(entities)
-
-
-# ============================================================
-# HELPERS
-# ============================================================
-def get_current_index():
-    now = dt_util.now()
-    total_seconds = now.hour * 3600 + now.minute * 60 + now.second         
-    return max((total_seconds - 1) // 900, 0)
-    
-def idx_to_time(i, factor):
-    h = i // factor
-    m = (i % factor) * (60 // factor)
-    return f"{h:02d}:{m:02d}"
+        elif key == "refresh_fetch_time":
+            entities.append(RCEFetchTimeSensor(coordinator, entry.entry_id, description))
 
-def format_range(start, end, factor):
-    return f"{idx_to_time(start, factor)} - {idx_to_time(end, factor)}"
+        elif key == "refresh_compute_time":
+            entities.append(RCEComputeTimeSensor(coordinator, entry.entry_id, description))
 
-def find_next_window(mask, start_idx):
-    if not mask:
-        return None, None
+        elif key == "payload_size":
+            entities.append(RCEPayloadSizeSensor(coordinator, entry.entry_id, description))
 
-    start = None
-    end = None
-    for i in range(start_idx, len(mask)):
-        if mask[i]:
-            start = i
-            break
+        elif key == "state_writes":
+            entities.append(RCEStateWritesSensor(coordinator, entry.entry_id, description))
 
-    if start is None:
-        return None, None
+    if entry.options.get(CONF_BATTERY_CAPACITY, DEFAULT_BATTERY_CAPACITY) > 0:
+        action, profit = BATTERY_SENSORS
+        entities.append(RCEBatteryActionSensor(coordinator, entry.entry_id, action))
+        entities.append(RCEBatteryProfitSensor(coordinator, entry.entry_id, profit))
 
-    for i in range(start, len(mask)):
-        if not mask[i]:
-            end = i
-            break
+    for plan in entry.options.get(CONF_PLANS, []):
+        entities.append(
+            RCEPlanCostSensor(coordinator, entry.entry_id, PLAN_COST, plan[CONF_PROFILE_NAME])
+        )
 
-    if end is None:
-        end = len(mask)
+    async_add_entities(entities)
 
-    return start, end
 
 # ============================================================
 # BASE
@@ -205,54 +287,42 @@ class RCESensorBase(RCEBaseEntity, SensorEntity):
 class RCEWindowBaseSensor(RCESensorBase):
     day_key = "today"
 
-    def _get_data(self):
-        data = self.coordinator.data
-        return (
-            data.get(f"cheap_mask_{self.day_key}"),
-            data.get(f"prices_{self.day_key}"),
-            data,
-        )
+    def _analysis(self) -> DayAnalysis:
+        return self.coordinator.data.get(f"analysis_{self.day_key}", EMPTY_DAY)
 
     def _factor(self, data):
-        return 4 if data.get("resolution") == RESOLUTION_15M else 1
+        # indeksy okien są zawsze w slotach 15-min, także w trybie 1h
+        return 4
 
 # ============================================================
 # CORE SENSORS
 # ============================================================
 class RCEMarketPriceSensor(RCESensorBase):                                                             
     """Current electricity market price."""                                                            
+
+    _slot_dependent = True
+    _unrecorded_attributes = frozenset(ARRAY_ATTRIBUTES)
                                                                                                        
     @property                                                                                          
     def native_value(self):                                                                            
-        prices = self.coordinator.data.get("prices_today")                                             
-        if not prices:                                                                                 
-            return None                                                                                
-                                                                                                       
-        idx = get_current_index()                                                                      
-        return prices[idx] if idx < len(prices) else None                                              
+        if not self.coordinator.data.get("prices_today"):
+            return None
+
+        day, idx = self._day_slot()
+        prices = self.coordinator.data.get(f"prices_{day}")
+        return prices[idx] if prices and idx < len(prices) else None
                                                                                                        
     @property                                                                                          
-    def extra_state_attributes(self):                                                                  
-        data = self.coordinator.data or {}                                                             
-        stats = data.get("stats", {})                                                                  
-                                                                                                       
-        return {                                                                                       
-            "price_mode": data.get("price_mode"),                                                      
-            "operation_mode": data.get("operation_mode"),                                              
-            "peak_range": data.get("peak_range"),                                                      
-            "average": stats.get("average"),                                                           
-            "min": stats.get("min"),                                                                   
-            "max": stats.get("max"),                                                                   
-            "median": stats.get("median"),                                                             
-            "low_price_cutoff": data.get("low_price_cutoff"),                                          
-            "prices_today": data.get("prices_today"),                                                  
-            "cheap_mask_today": data.get("cheap_mask_today"),                                          
-            "prices_tomorrow": data.get("prices_tomorrow"),                                            
-            "cheap_mask_tomorrow": data.get("cheap_mask_tomorrow"),                                    
-        }                                                                                              
+    def extra_state_attributes(self):
+        compact = self.coordinator.entry.options.get(
+            CONF_COMPACT_ATTRIBUTES, DEFAULT_COMPACT_ATTRIBUTES
+        )
+        return market_price_attributes(self.coordinator.data or {}, compact)
                                                             
 
 class RCENextPriceSensor(RCESensorBase):
+    _slot_dependent = True
+
     @property
     def native_value(self):
         data = self.coordinator.data
@@ -261,12 +331,14 @@ class RCENextPriceSensor(RCESensorBase):
         if not prices:
             return None
 
-        idx = get_current_index() + 1
+        idx = self._slot_index() + 1
         if idx < len(prices):
             return prices[idx]
 
-        if data.get("prices_tomorrow"):
-            return data["prices_tomorrow"][0]
+        idx -= len(prices)
+        tomorrow = data.get("prices_tomorrow")
+        if tomorrow and idx < len(tomorrow):
+            return tomorrow[idx]
 
         return None
 
@@ -275,25 +347,31 @@ class RCENextPriceSensor(RCESensorBase):
 # ============================================================
 class RCENextCheapWindowSensor(RCEWindowBaseSensor):                                                   
     day_key = "today"                                                                                  
+    _slot_dependent = True
                                                                                                        
-    def _start_index(self):                                                                            
-        return get_current_index() if self.day_key == "today" else 0                                   
-                                                                                                       
-    @property                                                                                          
-    def native_value(self):                                                                            
-        mask, _, data = self._get_data()                                                               
-        if not mask:                                                                                   
-            return None                                                                                
-                                                                                                       
-        start, end = find_next_window(mask, self._start_index())                                       
-                                                                                                       
-        if start is None:                                                                              
-            return None                                                                                
-                                                                                                       
-        return format_range(start, end, self._factor(data)) 
+    def _start(self) -> tuple[DayAnalysis, int]:
+        """Day analysis and slot the next window is searched from."""
+        if self.day_key != "today":
+            return self._analysis(), 0
+        # przed odświeżeniem o północy bieżący slot należy już do "jutra"
+        day, idx = self._day_slot()
+        return self.coordinator.data.get(f"analysis_{day}", EMPTY_DAY), idx
+
+    @property
+    def native_value(self):
+        analysis, start_idx = self._start()
+        window = analysis.upcoming(start_idx)
+
+        if window is None:
+            return None
+
+        # trwające okno liczone od bieżącego slotu
+        start = max(window["start"], start_idx)
+        return format_range(start, window["end"], self._factor(self.coordinator.data))
         
 class RCENextCheapWindowTomorrowSensor(RCENextCheapWindowSensor):
     day_key = "tomorrow"
+    _slot_dependent = False
 
 # ============================================================
 # BEST WINDOW
@@ -336,6 +414,48 @@ class RCEBestWindowTodaySensor(RCEBestWindowBase):
 class RCEBestWindowTomorrowSensor(RCEBestWindowBase):
     day_key = "tomorrow"
 
+# ============================================================
+# HORIZON (now -> end of tomorrow, absolute timestamps)
+# ============================================================
+def window_attributes(window):
+    return {
+        "start": dt_util.as_local(window["start_time"]).isoformat(),
+        "end": dt_util.as_local(window["end_time"]).isoformat(),
+        "avg_price": window["avg"],
+        "min_price": window["min"],
+        "max_price": window["max"],
+        "duration_minutes": window["length"] * 15,
+    }
+
+class RCEHorizonWindowBase(RCESensorBase):
+    _slot_dependent = True
+    # "next" = najbliższe okno, "best" = najtańsze z pozostałych
+    window_kind = "next"
+
+    def _get_window(self):
+        now = dt_util.utcnow()
+        windows = self.coordinator.data.get("windows_horizon") or []
+        upcoming = [w for w in windows if w["end_time"] > now]
+        if self.window_kind == "best":
+            return min(upcoming, key=lambda w: w["avg"], default=None)
+        return upcoming[0] if upcoming else None
+
+    @property
+    def native_value(self):
+        window = self._get_window()
+        return window["start_time"] if window else None
+
+    @property
+    def extra_state_attributes(self):
+        window = self._get_window()
+        return window_attributes(window) if window else {}
+
+class RCENextCheapWindowHorizonSensor(RCEHorizonWindowBase):
+    window_kind = "next"
+
+class RCEBestWindowHorizonSensor(RCEHorizonWindowBase):
+    window_kind = "best"
+
 # ============================================================
 # TOP 3
 # ============================================================
@@ -355,21 +475,7 @@ class RCETop3WindowsBase(RCEWindowBaseSensor):
         if not top:
             return {}
 
-        data = self.coordinator.data
-        factor = self._factor(data)
-
-        return {
-            "windows": [
-                {
-                    "range": format_range(w["start"], w["end"], factor),
-                    "avg_price": w["avg"],
-                    "min_price": w["min"],
-                    "max_price": w["max"],
-                    "duration_slots": w["end"] - w["start"],
-                }
-                for w in top
-            ]
-        }
+        return top_windows_attributes(top, self._factor(self.coordinator.data))
 
 class RCETop3WindowsTodaySensor(RCETop3WindowsBase):
     day_key = "today"
@@ -377,6 +483,29 @@ class RCETop3WindowsTodaySensor(RCETop3WindowsBase):
 class RCETop3WindowsTomorrowSensor(RCETop3WindowsBase):
     day_key = "tomorrow"
 
+# ============================================================
+# PROVISIONAL TOMORROW
+# ============================================================
+class RCEProvisionalMixin:
+    """Tomorrow from the history forecast, real prices once published."""
+
+    day_key = "forecast_tomorrow"
+
+    @property
+    def extra_state_attributes(self):
+        provisional = self.coordinator.data.get("tomorrow_provisional", False)
+        return {
+            **super().extra_state_attributes,
+            "provisional": provisional,
+            "source": "forecast" if provisional else "pse",
+        }
+
+class RCEBestWindowProvisionalSensor(RCEProvisionalMixin, RCEBestWindowBase):
+    pass
+
+class RCETop3WindowsProvisionalSensor(RCEProvisionalMixin, RCETop3WindowsBase):
+    pass
+
 class RCECheapestPriceTodaySensor(RCESensorBase):
     @property
     def native_value(self):
@@ -391,28 +520,168 @@ class RCECheapestHourTomorrowSensor(RCESensorBase):
         if data.get("api_status") != "ok":
             return None
 
-        prices = data.get("prices_tomorrow")
-        if not prices:
+        idx = data.get("analysis_tomorrow", EMPTY_DAY).argmin
+        if idx is None:
             return None
 
-        idx = prices.index(min(prices))
-        factor = 4 if data.get("resolution") == RESOLUTION_15M else 1
-        hour = idx // factor
-        minute = (idx % factor) * (60 // factor)
-        tomorrow = dt_util.now() + timedelta(days=1)
-
-        return tomorrow.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # sloty 15-min od północy (UTC, więc poprawne także w dni zmiany czasu)
+        midnight = dt_util.start_of_local_day(dt_util.now().date() + timedelta(days=1))
+        return dt_util.as_utc(midnight) + timedelta(minutes=15 * idx)
 
 # ============================================================
 # DIAGNOSTIC
 # ============================================================
 class RCEApiStatusSensor(RCESensorBase):
+    _metrics_dependent = True
+
     @property
     def native_value(self):
         return self.coordinator.data.get("api_status")
 
 class RCELastSuccessfulUpdateSensor(RCESensorBase):
+    _metrics_dependent = True
+
     @property
     def native_value(self):
         return self.coordinator.last_successful_update
 
+class RCEFetchTimeSensor(RCESensorBase):
+    _metrics_dependent = True
+
+    @property
+    def native_value(self):
+        return round(sum(self.coordinator.metrics["fetch_latency_ms"].values()), 1)
+
+    @property
+    def extra_state_attributes(self):
+        metrics = self.coordinator.metrics
+        return {
+            "fetch_latency_ms": metrics["fetch_latency_ms"],
+            "parse_ms": metrics["parse_ms"],
+        }
+
+class RCEComputeTimeSensor(RCESensorBase):
+    _metrics_dependent = True
+
+    @property
+    def native_value(self):
+        return self.coordinator.metrics["compute_ms"]
+
+class RCEPayloadSizeSensor(RCESensorBase):
+    _metrics_dependent = True
+
+    @property
+    def native_value(self):
+        return self.coordinator.metrics["bytes_received"]
+
+class RCEStateWritesSensor(RCESensorBase):
+    _metrics_dependent = True
+
+    @property
+    def native_value(self):
+        return self.coordinator.metrics["state_writes"]
+
+    @property
+    def extra_state_attributes(self):
+        sizes = self.coordinator.metrics["attributes_bytes"]
+        return {"serialized_state_bytes": sum(sizes.values())}
+
+
+# ============================================================
+# ENERGY PLANS
+# ============================================================
+class RCEPlanCostSensor(RCESensorBase):
+    """Expected cost of the current (or next) cycle of an energy plan."""
+
+    _slot_dependent = True
+    _quarter_hour = True
+
+    def __init__(self, coordinator, entry_id, description, plan_name):
+        super().__init__(coordinator, entry_id, description)
+        self._plan = slugify(plan_name)
+        self._attr_translation_placeholders = {"plan": plan_name}
+        self._attr_unique_id = f"{entry_id}_plan_{self._plan}_cost"
+        self.entity_id = f"sensor.rce_plan_{self._plan}_cost"
+
+    def _cycle(self):
+        plan = self.coordinator.data.get("plans", {}).get(self._plan, {})
+        return active_cycle(plan, self._slot_index())
+
+    @property
+    def native_value(self):
+        cycle = self._cycle()
+        return cycle.get("cost") if cycle else None
+
+    @property
+    def extra_state_attributes(self):
+        cycle = self._cycle()
+        if cycle is None:
+            return {}
+        return {
+            "average_price": cycle.get("average_price"),
+            "complete": cycle["complete"],
+            "feasible": cycle["feasible"],
+        }
+
+
+# ============================================================
+# BATTERY ARBITRAGE
+# ============================================================
+class RCEBatteryActionSensor(RCESensorBase):
+    """Planned battery action (charge / idle / discharge) in the current slot."""
+
+    _slot_dependent = True
+    # harmonogram baterii jest w slotach 15-min także w trybie 1h
+    _quarter_hour = True
+
+    def _slot(self):
+        data = self.coordinator.data
+        battery = data.get("battery")
+        if not battery or data.get("horizon_start") is None:
+            return None, None
+        index = (dt_util.utcnow() - data["horizon_start"]) // SLOT_DURATION
+        if not 0 <= index < len(battery["actions"]):
+            return battery, None
+        return battery, index
+
+    @property
+    def native_value(self):
+        battery, index = self._slot()
+        return ACTIONS[battery["actions"][index]] if index is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        battery, index = self._slot()
+        if index is None:
+            return {}
+
+        actions = battery["actions"]
+        change = next(
+            (i for i in range(index + 1, len(actions)) if actions[i] != actions[index]), None
+        )
+        start = self.coordinator.data["horizon_start"]
+        return {
+            "target_soc": battery["soc"][index],
+            "next_action": ACTIONS[actions[change]] if change is not None else None,
+            "next_change": dt_util.as_local(start + SLOT_DURATION * change).isoformat()
+            if change is not None else None,
+        }
+
+
+class RCEBatteryProfitSensor(RCESensorBase):
+    """Expected arbitrage profit of the battery schedule over the horizon."""
+
+    @property
+    def native_value(self):
+        battery = self.coordinator.data.get("battery")
+        return battery["profit"] if battery else None
+
+    @property
+    def extra_state_attributes(self):
+        battery = self.coordinator.data.get("battery")
+        if not battery:
+            return {}
+        return {
+            "charged_kwh": battery["charged_kwh"],
+            "discharged_kwh": battery["discharged_kwh"],
+        }
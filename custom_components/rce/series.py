@@ -0,0 +1,123 @@
+"""Compact price and mask series for the RCE integration.
+
+Prices are kept in array('d') - 8 bytes per value instead of a float
+object plus a list slot - and masks as an int bitset. Hourly prices store
+one value per hour and are read as 15-minute slots through a stride-aware
+view.
+"""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Sequence
+from itertools import chain, repeat
+
+
+def price_array(values: Iterable[float]) -> array:
+    return array("d", values)
+
+
+# ============================================================
+# HOURLY VIEW
+# ============================================================
+class HourlySeries(Sequence):
+    """One price per hour, read as `stride` identical quarter-hour slots."""
+
+    __slots__ = ("values", "stride")
+
+    def __init__(self, values: Iterable[float], stride: int = 4) -> None:
+        self.values = values if isinstance(values, array) else price_array(values)
+        self.stride = stride
+
+    def __len__(self) -> int:
+        return len(self.values) * self.stride
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            values, stride = self.values, self.stride
+            return [values[i // stride] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("HourlySeries index out of range")
+        return self.values[index // self.stride]
+
+    def __iter__(self):
+        stride = self.stride
+        return chain.from_iterable(repeat(value, stride) for value in self.values)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, HourlySeries):
+            return self.stride == other.stride and self.values == other.values
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"HourlySeries({self.values.tolist()!r}, stride={self.stride})"
+
+
+# ============================================================
+# BITSET MASK
+# ============================================================
+class Bitmask(Sequence):
+    """Immutable boolean mask packed into a single int, bit i is slot i."""
+
+    __slots__ = ("bits", "length")
+
+    def __init__(self, bits: int = 0, length: int = 0) -> None:
+        self.bits = bits
+        self.length = length
+
+    @classmethod
+    def from_bools(cls, values: Iterable[bool]) -> Bitmask:
+        bits = 0
+        length = 0
+        for i, value in enumerate(values):
+            if value:
+                bits |= 1 << i
+            length = i + 1
+        return cls(bits, length)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [bool(self.bits >> i & 1) for i in range(*index.indices(self.length))]
+
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("Bitmask index out of range")
+        return bool(self.bits >> index & 1)
+
+    def __iter__(self):
+        bits = self.bits
+        for i in range(self.length):
+            yield bool(bits >> i & 1)
+
+    def count_set(self) -> int:
+        return bin(self.bits).count("1")
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Bitmask):
+            return self.bits == other.bits and self.length == other.length
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.bits, self.length))
+
+    def __repr__(self) -> str:
+        return f"Bitmask({self.bits:#x}, length={self.length})"
+
+
+def as_list(value):
+    """Plain list for compact series (state attributes, service responses)."""
+    if isinstance(value, (array, HourlySeries, Bitmask)):
+        return list(value)
+    return value
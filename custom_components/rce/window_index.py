@@ -0,0 +1,82 @@
+"""Sorted interval index of cheap windows for the RCE calendar.
+
+Windows are built once per data change and range queries are answered by
+bisection instead of rescanning masks.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+SLOT = timedelta(minutes=15)
+
+
+class TimedWindow(NamedTuple):
+    """A cheap window with absolute start / end instants."""
+
+    start: datetime
+    end: datetime
+    avg: float
+    min: float
+    max: float
+
+
+def timed_windows(windows: Iterable[dict], day_start: datetime) -> list[TimedWindow]:
+    """Slot-indexed windows of one day as instants; day_start must be UTC."""
+    return [
+        TimedWindow(
+            day_start + SLOT * w["start"],
+            day_start + SLOT * w["end"],
+            w["avg"],
+            w["min"],
+            w["max"],
+        )
+        for w in windows
+    ]
+
+
+def merge_adjacent(windows: Iterable[TimedWindow]) -> list[TimedWindow]:
+    """Sorted windows with touching ones (e.g. across midnight) joined."""
+    merged: list[TimedWindow] = []
+    for window in sorted(windows):
+        if merged and merged[-1].end == window.start:
+            last = merged[-1]
+            a = (last.end - last.start).total_seconds()
+            b = (window.end - window.start).total_seconds()
+            merged[-1] = TimedWindow(
+                last.start,
+                window.end,
+                round((last.avg * a + window.avg * b) / (a + b), 2),
+                min(last.min, window.min),
+                max(last.max, window.max),
+            )
+        else:
+            merged.append(window)
+    return merged
+
+
+class WindowIndex:
+    """Non-overlapping windows sorted by start, so ends are sorted as well."""
+
+    __slots__ = ("windows", "starts", "ends")
+
+    def __init__(self, windows: Iterable[TimedWindow] = ()) -> None:
+        self.windows: Sequence[TimedWindow] = sorted(windows)
+        self.starts = [w.start for w in self.windows]
+        self.ends = [w.end for w in self.windows]
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    def between(self, start: datetime, end: datetime) -> list[TimedWindow]:
+        """Windows overlapping [start, end)."""
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end, lo=first)
+        return list(self.windows[first:last])
+
+    def current_or_next(self, now: datetime) -> TimedWindow | None:
+        """Window in progress at now, else the next one to start."""
+        i = bisect_right(self.ends, now)
+        return self.windows[i] if i < len(self.windows) else None